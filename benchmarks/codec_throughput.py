@@ -0,0 +1,58 @@
+''' Reports the MB/s at which `save` and `load` write and read each format with every installed
+backend of `_codec_backends`, and with pickle protocols 4 and 5, to verify the gain of the fast
+backends in a given environment. Usage: `python benchmarks/codec_throughput.py [megabytes] [directory]`. '''
+from importlib import import_module
+from itertools import product
+from os import remove
+from os.path import getsize, join
+from sys import argv, path as sys_path
+from tempfile import gettempdir
+from time import perf_counter
+
+sys_path.insert(0, join(sys_path[0], '..'))
+
+from simpler import files
+from simpler.files import load, save
+
+RECORD = {'id': 0, 'name': 'Lorem ipsum dolor sit amet', 'values': [1.5, 2.5, 3.5], 'active': True, 'tags': ['a', 'b']}
+CODECS = {'json': ('json_loads',), 'jsonl': ('json_loads', 'json_dumps'), 'yaml': ('yaml',)}
+
+def installed(backend: str) -> bool:
+	try:
+		import_module(backend)
+		return True
+	except ImportError:
+		return False
+
+def measure(path: str, format: str, content: list, **kwargs) -> tuple:
+	''' Returns the MB written, and the MB/s of saving and loading the content. '''
+	start = perf_counter()
+	save(path, content, format, inner_kwargs=kwargs or None)
+	saved = perf_counter() - start
+	start = perf_counter()
+	load(path, format)
+	loaded = perf_counter() - start
+	size = getsize(path) / 2 ** 20
+	remove(path)
+	return size, size / saved, size / loaded
+
+def main() -> None:
+	megabytes = float(argv[1]) if len(argv) > 1 else 64
+	directory = argv[2] if len(argv) > 2 else gettempdir()
+	content = [dict(RECORD, id=i) for i in range(int(megabytes * 2 ** 20 / 120))]
+	print('%-7s %-28s %9s %12s %12s' % ('format', 'backend', 'MB', 'save MB/s', 'load MB/s'))
+	for format, codecs in CODECS.items():
+		for backends in product(*(files._codec_backends[codec] for codec in codecs)):
+			if not all(map(installed, backends)):
+				print('%-7s %-28s not installed' % (format, '/'.join(backends)))
+				continue
+			files._codec_backend_cache.update(zip(codecs, backends))
+			path = join(directory, 'codec_throughput.' + format)
+			print('%-7s %-28s %9.1f %12.1f %12.1f' % ((format, '/'.join(backends)) + measure(path, format, content)))
+		files._codec_backend_cache.clear()
+	for protocol in (4, 5):
+		path = join(directory, 'codec_throughput.pickle')
+		print('%-7s %-28s %9.1f %12.1f %12.1f' % (('pickle', 'protocol %d' % protocol) + measure(path, 'pickle', content, protocol=protocol)))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,51 @@
+''' Guards the cold import time of the package against regressions. It imports `simpler` in
+fresh interpreters with `python -X importtime`, and fails if the median cumulative import time
+exceeds the threshold or if any submodule is imported eagerly. Usage:
+`python benchmarks/import_time.py [threshold_milliseconds] [runs]`. '''
+from os.path import abspath, dirname, join
+from os import environ
+from statistics import median
+from subprocess import run
+from sys import argv, executable, exit
+
+ROOT = abspath(join(dirname(__file__), '..'))
+EAGER = {'simpler', 'simpler._version'}
+
+def import_time() -> tuple:
+	''' Returns the cumulative import time of `simpler` in microseconds and the simpler modules imported. '''
+	env = dict(environ, PYTHONPATH=ROOT)
+	process = run([executable, '-X', 'importtime', '-c', 'import simpler'], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+	total, modules = None, set()
+	for line in process.stderr.splitlines():
+		if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+			continue
+		_, cumulative, name = line.split('|')
+		name = name.strip()
+		if name.startswith('simpler'):
+			modules.add(name)
+			if name == 'simpler':
+				total = int(cumulative)
+	return total, modules
+
+def main() -> None:
+	threshold = float(argv[1]) if len(argv) > 1 else 5
+	runs = int(argv[2]) if len(argv) > 2 else 7
+	import_time()  # warm up the bytecode cache
+	times, modules = [], set()
+	for _ in range(runs):
+		total, imported = import_time()
+		times.append(total / 1000)
+		modules |= imported
+	res = median(times)
+	print('import simpler: %.2f ms (median of %d runs, threshold %.2f ms)' % (res, runs, threshold))
+	failed = False
+	if modules - EAGER:
+		print('FAIL: submodules imported eagerly: %s' % ', '.join(sorted(modules - EAGER)))
+		failed = True
+	if res > threshold:
+		print('FAIL: the import takes longer than the threshold')
+		failed = True
+	exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
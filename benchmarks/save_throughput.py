@@ -0,0 +1,56 @@
+''' Compares the throughput and peak memory of saving a jsonl file by joining every line in a
+single string (the previous behaviour of `save`) and by streaming a generator of records, which is
+what `save` does now. Each path runs in its own process so that their peak memory is measured
+separately. Usage: `python benchmarks/save_throughput.py [megabytes] [directory]`. '''
+from multiprocessing import get_context
+from os import remove
+from os.path import getsize, join
+from sys import argv, path as sys_path
+from tempfile import gettempdir
+from time import perf_counter
+
+sys_path.insert(0, join(sys_path[0], '..'))
+
+RECORD = {'id': 0, 'name': 'Lorem ipsum dolor sit amet', 'values': [1.5, 2.5, 3.5], 'active': True}
+
+def records(megabytes: int):
+	''' Yields records until they take about the given megabytes once serialized. '''
+	from json import dumps
+	size = len(dumps(RECORD, ensure_ascii=False)) + 1
+	for i in range(megabytes * 2 ** 20 // size):
+		yield dict(RECORD, id=i)
+
+def joined(path: str, megabytes: int) -> None:
+	from json import dumps
+	from simpler.files import save
+	save(path, '\n'.join(dumps(record, ensure_ascii=False) for record in records(megabytes)), 'string')
+
+def streamed(path: str, megabytes: int) -> None:
+	from simpler.files import save
+	save(path, records(megabytes), 'jsonl')
+
+def run(method: str, path: str, megabytes: int, queue) -> None:
+	from resource import getrusage, RUSAGE_SELF
+	start = perf_counter()
+	globals()[method](path, megabytes)
+	queue.put((perf_counter() - start, getrusage(RUSAGE_SELF).ru_maxrss))
+
+def main() -> None:
+	megabytes = int(argv[1]) if len(argv) > 1 else 2048
+	directory = argv[2] if len(argv) > 2 else gettempdir()
+	context = get_context('spawn')
+	for method in ('joined', 'streamed'):
+		path = join(directory, 'save_throughput_%s.jsonl' % method)
+		queue = context.Queue()
+		process = context.Process(target=run, args=(method, path, megabytes, queue))
+		process.start()
+		seconds, peak = queue.get()
+		process.join()
+		size = getsize(path) / 2 ** 20
+		remove(path)
+		print('%-8s  %8.1f MB  %7.2f s  %8.1f MB/s  %8.1f MB peak memory' % (
+			method, size, seconds, size / seconds, peak / 2 ** 10  # ru_maxrss is in kilobytes on Linux
+		))
+
+if __name__ == '__main__':
+	main()
@@ -1,14 +1,35 @@
 from simpler._version import __version__
-from simpler.algorithms import DynamicProgramming, deep_merge
-from simpler.bioinformatics import codon_table, monoisotopic_mass_table, monoisotopic_mass_water, parse_fasta, dna_to_rna, rna_to_dna, rna_to_protein, reverse_complement
-from simpler.connectors import SQL, Excel
-from simpler.files import cwd, load, save, disk_cache, mem_cache, clear_global_mem_cache, size, find_hidden_compressed, tvshow_rename, directory_compare, decompress, register_protocol_handler, import_from_path, already_running
-from simpler.format import human_bytes, human_seconds, human_date, random_string, print_matrix, safe_filename
-from simpler.mail import compose, send
-from simpler.math import clamp, snap, unique, all_equal, jaccard, levenshtein, base_change, prime_list, is_prime, fibonacci, lcm, gcd, factor, palindrome_list, phi, date_range
-from simpler.profiling import tic, toc, deep_size
-from simpler.sparql import dbpedia, entity_types
-from simpler.terminal import getch, cprint
-from simpler.tests import Test, Suite
-from simpler.validation import assert_set, assert_str, assert_number, assert_id, assert_mail, assert_exists
-from simpler.web import download_file, DownloaderPool, throttle, Driver
\ No newline at end of file
+
+_exports = {
+	'algorithms': ('DynamicProgramming', 'deep_merge'),
+	'bioinformatics': ('codon_table', 'monoisotopic_mass_table', 'monoisotopic_mass_water', 'parse_fasta', 'dna_to_rna', 'rna_to_dna', 'rna_to_protein', 'reverse_complement'),
+	'connectors': ('SQL', 'Excel'),
+	'files': ('cwd', 'load', 'MappedText', 'iter_load', 'load_many', 'archive_members', 'save', 'disk_cache', 'DiskCache', 'mem_cache', 'MemCache', 'tiered_cache', 'clear_global_mem_cache', 'cache_report', 'size', 'find_hidden_compressed', 'scan_hidden_compressed', 'scan_hidden_compressed_many', 'tvshow_rename', 'directory_compare', 'directory_manifest', 'decompress', 'register_protocol_handler', 'import_from_path', 'already_running'),
+	'format': ('human_bytes', 'human_seconds', 'human_date', 'random_string', 'print_matrix', 'safe_filename'),
+	'mail': ('compose', 'send'),
+	'math': ('clamp', 'snap', 'unique', 'all_equal', 'jaccard', 'levenshtein', 'base_change', 'prime_list', 'is_prime', 'fibonacci', 'lcm', 'gcd', 'factor', 'palindrome_list', 'phi', 'date_range'),
+	'profiling': ('tic', 'toc', 'deep_size'),
+	'sparql': ('dbpedia', 'entity_types'),
+	'terminal': ('getch', 'cprint'),
+	'tests': ('Test', 'Suite'),
+	'validation': ('assert_set', 'assert_str', 'assert_number', 'assert_id', 'assert_mail', 'assert_exists'),
+	'web': ('download_file', 'DownloaderPool', 'throttle', 'Driver')
+}
+_origins = {name: module for module, names in _exports.items() for name in names}
+__all__ = ['__version__', *_origins]
+
+def __getattr__(name):
+	''' Imports the submodule defining the requested name the first time it is accessed, so that
+	`import simpler` does not load every submodule and its dependencies. '''
+	from importlib import import_module
+	if name in _origins:
+		value = getattr(import_module('simpler.' + _origins[name]), name)
+	elif name in _exports:
+		value = import_module('simpler.' + name)
+	else:
+		raise AttributeError('module %r has no attribute %r' % (__name__, name))
+	globals()[name] = value
+	return value
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__) | set(_exports))
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from re import compile, IGNORECASE
 from simpler.terminal import cprint
 from typing import Any, Generator, List, Optional, Union
@@ -10,13 +11,25 @@ class SQL:
 		self, host: str = 'localhost', user: str = None, password: str = None, db: str = None,
 		charset: str = 'utf8mb4', collation: str = 'utf8mb4_general_ci', use_unicode: bool = True,
 		max_insertions: int = None, print_queries: bool = False, native_types: bool = True,
-		engine: str = 'mysql', force_init: bool = False
+		engine: str = 'mysql', force_init: bool = False, pool_size: int = None,
+		pool_timeout: float = None, max_lifetime: float = None, local_infile: bool = False
 	) -> None:
+		''' Creates a connector for the given `engine`. If `pool_size` is defined, each thread gets
+		its own connection from a pool of that size, waiting up to `pool_timeout` seconds for one to
+		be released. Pooled connections are checked before being handed out, so dropped ones are
+		replaced, and they are renewed after `max_lifetime` seconds. If `local_infile` is set, MySQL and
+		MariaDB connections allow `LOAD DATA LOCAL INFILE`, which `bulk_load` uses to insert rows (the
+		server must allow it too). '''
 		assert engine in SQL.ENGINES, 'Accepted engine values are: %s.' % ', '.join(SQL.ENGINES)
 		self.max_insertions, self.native_types, self.engine, self.print_queries = max_insertions, native_types, engine, print_queries
 		if user is None:
 			user = 'postgres' if engine == 'postgre' else 'root'
-		self._connection, self._cursor, self._initialized = {'user': user}, {}, False
+		self._settings, self._cursor_settings, self.local_infile = {'user': user}, {}, local_infile
+		self._connection, self._cursor, self._initialized, self._pool = None, None, False, None
+		if pool_size is not None:
+			from threading import local
+			self._pool = _SQLPool(self._connect, self._ping, pool_size, pool_timeout, max_lifetime)
+			self._local = local()
 		if engine == 'mysql':
 			self._init_mysql(charset, collation, host, use_unicode, password, db)
 		elif engine == 'mariadb':
@@ -29,40 +42,44 @@ class SQL:
 			self.cursor()
 
 	def _init_mysql(self, charset, collation, host, use_unicode, password, db):
-		self._connection.update({
+		self._settings.update({
 			'charset': charset,
 			'collation': collation,
 			'host': host,
 			'use_unicode': use_unicode
 		})
 		if password:
-			self._connection.update({
+			self._settings.update({
 				'passwd': password,
 				'auth_plugin': 'mysql_native_password'
 			})
 		if db:
-			self._connection['db'] = db
-		self._cursor['buffered'] = True
+			self._settings['db'] = db
+		if self.local_infile:
+			self._settings['allow_local_infile'] = True
+		self._cursor_settings['buffered'] = True
 
 	def _init_mariadb(self, host, password, db):
 		from mariadb.constants.CLIENT import MULTI_STATEMENTS
 		from mariadb.constants.FIELD_TYPE import JSON
 		from json import loads
 
-		self._connection.update({
+		self._settings.update({
 			'host': host,
 			'password': password,
 			'database': db,
 			'client_flag': MULTI_STATEMENTS,
 			'converter': {JSON: loads}
 		})
+		if self.local_infile:
+			self._settings['local_infile'] = True
 
 	def _init_mssql(self, host, password, db):
-		self._connection['server'] = host
+		self._settings['server'] = host
 		if password:
-			self._connection['password'] = password
+			self._settings['password'] = password
 		if db:
-			self._connection['database'] = db
+			self._settings['database'] = db
 
 	def _init_postgre(self, host, password, db):
 		from psycopg import ClientCursor
@@ -76,7 +93,7 @@ class SQL:
 				return dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
 		adapters.register_dumper(dict, DictDumper)
 		adapters.register_loader(NUMERIC_OID, FloatLoader)
-		self._connection.update({
+		self._settings.update({
 			'dbname': db,
 			'host': host,
 			'password': password,
@@ -84,78 +101,162 @@ class SQL:
 		})
 
 	def close(self) -> None:
-		''' Closes the current cursor and connection. '''
-		if self._initialized:
+		''' Closes the current cursor and connection, along with the idle connections of the pool. '''
+		if self._pool is not None:
+			self.release()
+			self._pool.close()
+		elif self._initialized:
 			self._connection.close()
 			self._initialized = False
 
 	__del__ = close
 
+	def _connect(self):
+		''' Opens a new connection with the settings of the engine. '''
+		if self.engine == 'mysql':
+			try:
+				from mysql.connector import connect
+				if self.native_types:
+					self._settings['converter_class'] = _mysql_converter()
+			except ModuleNotFoundError:
+				raise ModuleNotFoundError('Missing MySQL/MariaDB connector. Install a mysql client and then do `pip install mysql.connector`.')
+		elif self.engine == 'mariadb':
+			try:
+				from mariadb import connect
+			except ModuleNotFoundError:
+				raise ModuleNotFoundError('Missing MySQL/MariaDB connector. Install a mysql client and then do `pip install mariadb`.')
+		elif self.engine == 'mssql':
+			try:
+				from pymssql import connect
+			except ModuleNotFoundError:
+				raise ModuleNotFoundError('Missing MS-SQL connector. Install a MS-SQL client and then do `pip install pymssql`.')
+		elif self.engine == 'postgre':
+			try:
+				from psycopg import connect
+			except ModuleNotFoundError:
+				raise ModuleNotFoundError('Missing PostgreSQL connector. Install a PostgreSQL client and then do `pip install "psycopg[binary]"`.')
+		return connect(**self._settings)
+
+	def _ping(self, connection) -> bool:
+		''' Returns whether a connection is still usable. '''
+		try:
+			cursor = connection.cursor()
+			cursor.execute('SELECT 1')
+			cursor.fetchall()
+			cursor.close()
+			if self.engine == 'postgre' and not connection.autocommit:
+				connection.rollback()  # don't leave the connection idle in a transaction
+			return True
+		except Exception:
+			return False
+
+	def connection(self):
+		''' Returns the connection of the current thread, opening it (or taking it from the pool)
+		if required. '''
+		if self._pool is None:
+			if not self._initialized:
+				self._connection = self._connect()
+				self._cursor = self._connection.cursor(**self._cursor_settings)
+				self._initialized = True
+			return self._connection
+		checkout = getattr(self._local, 'checkout', None)
+		if checkout is None:
+			checkout = self._local.checkout = _SQLCheckout(self._pool, self._cursor_settings)
+		return checkout.connection
+
 	def cursor(self):
-		''' Returns the open cursor and initializes the connection if required. '''
-		if not self._initialized:
-			if self.engine == 'mysql':
-				try:
-					from mysql.connector import connect
-					if self.native_types:
-						self._connection['converter_class'] = _mysql_converter()
-				except ModuleNotFoundError:
-					raise ModuleNotFoundError('Missing MySQL/MariaDB connector. Install a mysql client and then do `pip install mysql.connector`.')
-			elif self.engine == 'mariadb':
-				try:
-					from mariadb import connect
-				except ModuleNotFoundError:
-					raise ModuleNotFoundError('Missing MySQL/MariaDB connector. Install a mysql client and then do `pip install mariadb`.')
-			elif self.engine == 'mssql':
-				try:
-					from pymssql import connect
-				except ModuleNotFoundError:
-					raise ModuleNotFoundError('Missing MS-SQL connector. Install a MS-SQL client and then do `pip install pymssql`.')
-			elif self.engine == 'postgre':
+		''' Returns the open cursor of the current thread and initializes the connection if required. '''
+		self.connection()
+		return self._cursor if self._pool is None else self._local.checkout.cursor
+
+	def _connected(self) -> bool:
+		''' Returns whether the current thread holds an open connection. '''
+		if self._pool is None:
+			return self._initialized
+		return getattr(self._local, 'checkout', None) is not None
+
+	def release(self, broken: bool = False) -> None:
+		''' Gives the connection of the current thread back to the pool, which also happens when the
+		thread ends. If `broken` is set, the connection is closed instead. Without a pool, a broken
+		connection is closed and the next query opens a new one. '''
+		if self._pool is None:
+			if broken and self._initialized:
 				try:
-					from psycopg import connect
-				except ModuleNotFoundError:
-					raise ModuleNotFoundError('Missing PostgreSQL connector. Install a PostgreSQL client and then do `pip install "psycopg[binary]"`.')
-			self._connection = connect(**self._connection)
-			self._cursor = self._connection.cursor(**self._cursor)
-			self._initialized = True
-		return self._cursor
+					self._connection.close()
+				except Exception:
+					pass
+				self._initialized = False
+			return
+		checkout = getattr(self._local, 'checkout', None)
+		if checkout is not None:
+			self._local.checkout = None
+			checkout.release(broken)
+
+	def pool_stats(self) -> dict:
+		''' Returns the size, open, idle and in use connections of the pool, along with the number
+		of checkouts, how many of them had to wait and for how long, and the number of connections
+		replaced because they were dropped or too old. '''
+		assert self._pool is not None, 'This connector has no pool; set `pool_size` to use one.'
+		return self._pool.stats()
 
 	def execute(self, query: str, params: tuple = None, multi: bool = False, commit: bool = False):
 		''' Wrapper for the database connector execute method that won't send the params argument
 		if the params are empty, thus avoiding the need to replace % with %%. '''
-		if self.print_queries:
-			self.print_query(query, params)
 		error = None
 		try:
-			if self.engine == 'mysql':
-				statement = self.cursor().execute(query, params if params is not None and len(params) else None, multi=multi)
-				if multi:
-					try:
-						list(statement)
-					except RuntimeError:  # see https://bugs.mysql.com/bug.php?id=87818
-						pass
-			elif self.engine == 'mariadb':
-				# mariadb connector doesn't support adding encoders at parameter level, so we have to do JSON manually; see https://github.com/mariadb-corporation/mariadb-connector-python/blob/1.1/mariadb/cursors.py#L232 https://github.com/mariadb-corporation/mariadb-connector-python/blob/80b642b8a1a3b0b41b26e8cbe188cd91c8d1233b/mariadb/mariadb_codecs.c#L1400
-				from json import dumps
-				params = [dumps(param, ensure_ascii=False, separators=(',', ':')) if isinstance(param, dict) else param for param in params] if params is not None else None
-				self.cursor().execute(query, params if params is not None and len(params) else None)
-				if multi:
-					while self.cursor().nextset(): pass
-			elif self.engine == 'mssql':
-				assert not multi, 'MS-SQL connector does not support multistatement queries.'
-				self.cursor().execute(*([query] + ([params] if params else [])))
-			elif self.engine == 'postgre':
-				cursor = self.cursor()
-				self._connection.autocommit = True
-				cursor.execute(query, params if params is not None and len(params) else None)
+			if self.engine == 'postgre':
+				self.connection().autocommit = True
+			self._execute(query, params, multi)
 		except Exception as e:
 			error = e
-		if self._initialized and (commit or self.engine in ('mysql', 'mariadb')):
-			self._connection.commit()
+			if self._connected() and not self._ping(self.connection()):
+				self.release(broken=True)  # the connection was dropped, the next query reconnects
+		if self._connected() and (commit or self.engine in ('mysql', 'mariadb')):
+			self.connection().commit()
 		if error is not None:
 			raise error
 
+	def _execute(self, query: str, params: tuple = None, multi: bool = False) -> None:
+		''' Runs a query in the cursor of the current thread, without committing it. '''
+		if self.print_queries:
+			self.print_query(query, params)
+		if self.engine == 'mysql':
+			statement = self.cursor().execute(query, params if params is not None and len(params) else None, multi=multi)
+			if multi:
+				try:
+					list(statement)
+				except RuntimeError:  # see https://bugs.mysql.com/bug.php?id=87818
+					pass
+		elif self.engine == 'mariadb':
+			# mariadb connector doesn't support adding encoders at parameter level, so we have to do JSON manually; see https://github.com/mariadb-corporation/mariadb-connector-python/blob/1.1/mariadb/cursors.py#L232 https://github.com/mariadb-corporation/mariadb-connector-python/blob/80b642b8a1a3b0b41b26e8cbe188cd91c8d1233b/mariadb/mariadb_codecs.c#L1400
+			from json import dumps
+			params = [dumps(param, ensure_ascii=False, separators=(',', ':')) if isinstance(param, dict) else param for param in params] if params is not None else None
+			self.cursor().execute(query, params if params is not None and len(params) else None)
+			if multi:
+				while self.cursor().nextset(): pass
+		elif self.engine == 'mssql':
+			assert not multi, 'MS-SQL connector does not support multistatement queries.'
+			self.cursor().execute(*([query] + ([params] if params else [])))
+		elif self.engine == 'postgre':
+			self.cursor().execute(query, params if params is not None and len(params) else None)
+
+	@contextmanager
+	def _transaction(self) -> Generator[None, None, None]:
+		''' Runs the queries sent with `_execute` within the block in a single transaction, which is
+		committed at the end or rolled back if an exception is raised. '''
+		connection = self.connection()
+		if self.engine == 'postgre':
+			connection.autocommit = True
+			with connection.transaction():
+				yield
+		else:
+			try:
+				yield
+			except BaseException:
+				connection.rollback()
+				raise
+			connection.commit()
+
 	def print_query(self, query: str, params: tuple = None, color: str = 'yellow', max_size: int = 1000):
 		''' Shows a query attempting to inject the parameters, for debugging purposes. '''
 		if len(query) > max_size:
@@ -198,23 +299,78 @@ class SQL:
 
 	def find_all(self, query: str, *params: tuple) -> List[dict]:
 		''' Returns a list of {column: value} dicts of the selected rows. '''
-		return list(self.iter_all(query, *params))
+		rows = self.find_all_tuples(query, *params)
+		description = self.cursor().description
+		return [{k[0]: v for k, v in zip(description, row)} for row in rows]
 
 	def find_all_tuples(self, query: str, *params: tuple) -> List[tuple]:
 		''' Returns a list of tuples of the selected rows. '''
-		return list(self.iter_all_tuples(query, *params))
+		self.execute(query, params)
+		return list(self.cursor().fetchall())
 
-	def iter_all(self, query: str, *params: tuple) -> Generator[dict, None, None]:
-		''' Returns a generator of {column: value} dicts of the selected rows. '''
-		rows = self.iter_all_tuples(query, *params)
-		description = self.cursor().description
-		for row in rows:
-			yield {k[0]: v for k, v in zip(description, row)}
+	def iter_all(self, query: str, *params: tuple, batch_size: int = 1000) -> Generator[dict, None, None]:
+		''' Returns a generator of {column: value} dicts of the selected rows, which are streamed
+		from the server in batches of `batch_size` rows (see `iter_all_tuples`). '''
+		for description, rows in self._stream(query, params, batch_size):
+			for row in rows:
+				yield {k[0]: v for k, v in zip(description, row)}
 
-	def iter_all_tuples(self, query: str, *params: tuple) -> Generator[tuple, None, None]:
-		''' Returns a generator of tuples of the selected rows. '''
-		self.execute(query, params)
-		return self.cursor().fetchall()
+	def iter_all_tuples(self, query: str, *params: tuple, batch_size: int = 1000) -> Generator[tuple, None, None]:
+		''' Returns a generator of tuples of the selected rows, which are streamed from the server
+		in batches of `batch_size` rows, so the memory used doesn't depend on the size of the result.
+		With MySQL and MariaDB, the connection can't run other queries until the generator is
+		exhausted or closed, and closing it early reads the remaining rows. '''
+		for _, rows in self._stream(query, params, batch_size):
+			yield from rows
+
+	def _stream(self, query: str, params: tuple, batch_size: int) -> Generator[tuple, None, None]:
+		''' Runs a query in a cursor of its own that reads the rows as they are fetched, and yields
+		the description of the result along with each batch of rows. '''
+		if self.print_queries:
+			self.print_query(query, params)
+		params = params if params is not None and len(params) else None
+		connection = self.connection()
+		if self.engine == 'postgre':
+			from inspect import signature
+			from itertools import islice
+			connection.autocommit = True
+			cursor = connection.cursor()
+			# psycopg streams any statement in single-row mode, and cancels it if the generator is closed early
+			options = {'size': batch_size} if 'size' in signature(cursor.stream).parameters else {}
+			rows = cursor.stream(query, params, **options)
+			try:
+				for batch in iter(lambda: list(islice(rows, batch_size)), []):
+					yield cursor.description, batch
+			finally:
+				rows.close()
+				cursor.close()
+			return
+		if self.engine in ('mysql', 'mariadb'):
+			cursor = connection.cursor(buffered=False)
+			if self.engine == 'mariadb' and params is not None:
+				from json import dumps
+				params = [dumps(param, ensure_ascii=False, separators=(',', ':')) if isinstance(param, dict) else param for param in params]
+		else:
+			cursor = connection.cursor()  # pymssql reads the rows as they are fetched, and discards the rest on the next query
+		try:
+			if params is None:
+				cursor.execute(query)
+			else:
+				cursor.execute(query, params)
+			while True:
+				rows = cursor.fetchmany(batch_size)
+				if not rows:
+					break
+				yield cursor.description, rows
+		finally:
+			try:
+				if self.engine in ('mysql', 'mariadb'):
+					while cursor.fetchmany(batch_size): pass  # unread rows would break the next queries
+				cursor.close()
+				if self.engine in ('mysql', 'mariadb'):
+					connection.commit()  # end the read transaction, as `execute` does
+			except Exception:
+				self.release(broken=True)  # the connection can't be reused, the next query reconnects
 
 	def find_value(self, query: str, *params: tuple) -> Any:
 		''' Returns the value of the first column of the first selected row. '''
@@ -231,13 +387,15 @@ class SQL:
 
 	def find_column(self, query: str, *params: tuple) -> list:
 		''' Returns the value of the first column of every selected row. '''
-		return list(self.iter_column(query, *params))
-
-	def iter_column(self, query: str, *params: tuple) -> Generator[list, None, None]:
-		''' Returns a generator of the first column of every selected row. '''
 		self.execute(query, params)
-		for row in self.cursor().fetchall():
-			yield row[0]
+		return [row[0] for row in self.cursor().fetchall()]
+
+	def iter_column(self, query: str, *params: tuple, batch_size: int = 1000) -> Generator[list, None, None]:
+		''' Returns a generator of the first column of every selected row, which are streamed from
+		the server in batches of `batch_size` rows (see `iter_all_tuples`). '''
+		for _, rows in self._stream(query, params, batch_size):
+			for row in rows:
+				yield row[0]
 
 	def insert(self, query: str, *params: tuple) -> int:
 		''' Inserts a row and returns its id (if engine="postgre", you'll have to use the RETURNING keyword). '''
@@ -301,6 +459,146 @@ class SQL:
 		self.execute(query, params, commit=commit)
 		return int(self.cursor().lastrowid)
 
+	def bulk_load(self, table: str, rows: Any, columns: List[str] = None, batch_size: int = None) -> dict:
+		''' Inserts many rows with the native bulk path of the engine: `COPY FROM STDIN` in
+		PostgreSQL, `LOAD DATA LOCAL INFILE` in MySQL and MariaDB (if `local_infile` was set when
+		creating the connector) and bulk copy in MS-SQL, falling back to `insert_all` otherwise. The
+		rows can be a DataFrame or any iterable of {column: value} dicts or tuples, in which case they
+		are inserted into the given `columns` (or into every column, in order). They are sent in
+		batches of `batch_size` rows (`max_insertions` by default) and never fully loaded in memory.
+		Rows that `LOAD DATA` skips because of duplicate keys or invalid values are issued as a
+		warning rather than raised (see `_bulk_load_infile`). Returns the number of rows inserted, the
+		seconds it took and the rows per second. '''
+		from time import perf_counter
+		start = perf_counter()
+		columns, rows = _bulk_rows(rows, columns)
+		if batch_size is None:
+			batch_size = self.max_insertions or 100000
+		target = table if columns is None else '%s(%s)' % (table, ','.join(columns))
+		count = 0
+		if self.engine == 'postgre':
+			connection = self.connection()
+			connection.autocommit = True
+			if self.print_queries:
+				self.print_query('COPY %s FROM STDIN' % target)
+			with self.cursor().copy('COPY %s FROM STDIN' % target) as copy:
+				for row in rows:
+					copy.write_row(row)
+					count += 1
+		elif self.engine in ('mysql', 'mariadb') and self.local_infile:
+			count = self._bulk_load_infile(table, columns, rows, batch_size)
+		elif self.engine == 'mssql' and hasattr(self.connection(), 'bulk_copy'):
+			column_ids = None
+			if columns is not None:
+				ids = dict(self.find_all_tuples('SELECT name, column_id FROM sys.columns WHERE object_id = OBJECT_ID(%s)', table))
+				column_ids = [ids[column] for column in columns]
+			for batch in _batches(rows, batch_size):
+				self.connection().bulk_copy(table, batch, column_ids=column_ids, batch_size=batch_size)
+				count += len(batch)
+		else:
+			for batch in _batches(rows, batch_size):
+				if columns is None:
+					self.insert_all(table, batch, tuple_rows=True)
+				else:
+					self.insert_all(table, [dict(zip(columns, row)) for row in batch])
+				count += len(batch)
+		seconds = perf_counter() - start
+		return {'rows': count, 'seconds': seconds, 'rows_per_second': count / seconds if seconds else None}
+
+	def upsert_all(
+		self, table: str, rows: Any, key_columns: List[str], update_columns: List[str] = None,
+		columns: List[str] = None
+	) -> int:
+		''' Inserts a list of {column: value} dicts (or a DataFrame, or tuples of the values of the
+		given `columns`), updating the `update_columns` (by default, every column but the
+		`key_columns`) of the rows that already exist, which are the ones whose `key_columns` match.
+		This uses `ON CONFLICT DO UPDATE` in PostgreSQL, `ON DUPLICATE KEY UPDATE` in MySQL and
+		MariaDB (where any unique key of the table is a conflict) and `MERGE` in MS-SQL. Rows are sent
+		in batches of `max_insertions` within a single transaction, where only the last of the rows
+		with the same `key_columns` is kept, as every engine but MySQL refuses to affect a row twice.
+		Returns the number of affected rows, as reported by the engine. '''
+		columns, rows = _bulk_rows(rows, columns, required=True)
+		if columns is None:  # there are no rows
+			return 0
+		assert all(key in columns for key in key_columns), 'Every key column must be in the rows.'
+		if update_columns is None:
+			update_columns = [column for column in columns if column not in key_columns]
+		batch_size = self.max_insertions or 1000
+		if self.engine == 'mssql':
+			batch_size = min(batch_size, 2099 // len(columns))  # MS-SQL accepts 2100 parameters at most
+		values = '(%s)' % ','.join(['%s'] * len(columns))
+		keys = [columns.index(key) for key in key_columns]
+		count = 0
+		with self._transaction():
+			for batch in _batches(rows, batch_size):
+				batch = _last_rows(batch, keys)
+				tuples = ','.join([values] * len(batch))
+				if self.engine == 'postgre':
+					query = 'INSERT INTO %s(%s) VALUES %s ON CONFLICT (%s) DO %s' % (
+						table, ','.join(columns), tuples, ','.join(key_columns),
+						'UPDATE SET ' + ','.join('%s=EXCLUDED.%s' % (c, c) for c in update_columns) if update_columns else 'NOTHING'
+					)
+				elif self.engine in ('mysql', 'mariadb'):
+					query = 'INSERT INTO %s(%s) VALUES %s ON DUPLICATE KEY UPDATE %s' % (
+						table, ','.join(columns), tuples,
+						','.join('%s=VALUES(%s)' % (c, c) for c in (update_columns or key_columns[:1]))
+					)
+				else:
+					query = 'MERGE INTO %s AS target USING (VALUES %s) AS source(%s) ON %s%s WHEN NOT MATCHED THEN INSERT (%s) VALUES (%s);' % (
+						table, tuples, ','.join(columns),
+						' AND '.join('target.%s=source.%s' % (c, c) for c in key_columns),
+						' WHEN MATCHED THEN UPDATE SET ' + ','.join('%s=source.%s' % (c, c) for c in update_columns) if update_columns else '',
+						','.join(columns), ','.join('source.' + c for c in columns)
+					)
+				self._execute(query, [value for row in batch for value in row])
+				count += max(self.cursor().rowcount, 0)
+		return count
+
+	def _bulk_load_infile(self, table: str, columns: Optional[List[str]], rows: Any, batch_size: int) -> int:
+		''' Writes each batch of rows to a temporary tab-separated file and loads it with
+		`LOAD DATA LOCAL INFILE`. Binary values are written in hexadecimal and decoded with `UNHEX`,
+		which needs the column names, so batches with binary values and no `columns` are inserted
+		with `insert_all` instead. As with `IGNORE`, the server skips the rows that raise duplicate
+		key or conversion errors, reporting them as warnings instead, so they are not counted and the
+		first warnings are issued as a `RuntimeWarning`. Returns the number of rows loaded. '''
+		from os import close, remove
+		from tempfile import mkstemp
+		from warnings import warn
+		fd, path = mkstemp(suffix='.tsv')
+		close(fd)
+		query = (
+			"LOAD DATA LOCAL INFILE '%s' INTO TABLE %s CHARACTER SET utf8mb4 "
+			"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' %s"
+		)
+		count = 0
+		try:
+			for batch in _batches(rows, batch_size):
+				binary = sorted({i for row in batch for i, value in enumerate(row) if isinstance(value, (bytes, bytearray, memoryview))})
+				if binary and columns is None:
+					self.insert_all(table, batch, tuple_rows=True)
+					count += len(batch)
+					continue
+				with open(path, 'w', encoding='utf-8', newline='') as fp:
+					fp.writelines('\t'.join(_infile_value(value) for value in row) + '\n' for row in batch)
+				targets = '' if columns is None else '(%s)' % ','.join(
+					'@value%d' % i if i in binary else column for i, column in enumerate(columns)
+				)
+				if binary:
+					targets += ' SET ' + ','.join('%s=UNHEX(@value%d)' % (columns[i], i) for i in binary)
+				with self._transaction():
+					self._execute(query % (path.replace('\\', '/'), table, targets))
+					loaded = max(self.cursor().rowcount, 0)
+					if loaded < len(batch):
+						self._execute('SHOW WARNINGS LIMIT 3')  # before committing, which clears them
+						messages = [row[2] for row in self.cursor().fetchall()]
+						warn('LOAD DATA skipped %d of %d rows into %s: %s' % (
+							len(batch) - loaded, len(batch), table, '; '.join(messages)
+						), RuntimeWarning)
+				count += loaded
+		finally:
+			remove(path)
+		return count
+
 	def apply(self, query: str, *params: tuple) -> int:
 		''' Applies a modification (update or delete) and returns the number of affected rows. '''
 		self.execute(query, params, commit=True)
@@ -309,9 +607,9 @@ class SQL:
 	def update(self, table: str, updates: dict = lambda: {}, filters: dict = lambda: {}) -> int:
 		''' Executes an update operation and returns the number of affected rows, specifying
 		a {column: value} list of updates and a filters list, i.e. `{'a': 4, 'b': None}` will be
-		translated into `WHERE A = 4 and B = NULL`. '''
+		translated into `WHERE A = 4 and B = NULL`. To update many rows with distinct values, use
+		`update_all`. '''
 		query = 'UPDATE %s ' % table
-		# TODO use max_insertions here too
 		params = []
 		if len(updates):
 			values = []
@@ -328,6 +626,54 @@ class SQL:
 		self.execute(query, params, commit=True)
 		return int(self.cursor().rowcount)
 
+	def update_all(self, table: str, rows: Any, key_columns: List[str], columns: List[str] = None) -> int:
+		''' Updates many rows with distinct values, given as a list of {column: value} dicts (or a
+		DataFrame, or tuples of the values of the given `columns`) where the `key_columns` identify the
+		row to update and the rest of columns hold the new values. The rows are joined against the
+		updates in batches of `max_insertions` within a single transaction. Returns the number of
+		affected rows. '''
+		columns, rows = _bulk_rows(rows, columns, required=True)
+		if columns is None:  # there are no rows
+			return 0
+		assert all(key in columns for key in key_columns), 'Every key column must be in the rows.'
+		update_columns = [column for column in columns if column not in key_columns]
+		assert update_columns, 'There are no columns to update besides the key columns.'
+		batch_size = self.max_insertions or 1000
+		if self.engine == 'mssql':
+			batch_size = min(batch_size, 2099 // len(columns))  # MS-SQL accepts 2100 parameters at most
+		join = ' AND '.join('%s.%s=v.%s' % (table, c, c) for c in key_columns)
+		count = 0
+		with self._transaction():
+			for batch in _batches(rows, batch_size):
+				if self.engine == 'postgre':
+					from json import dumps
+					# the values are typed after the columns of the table by json_populate_recordset
+					query = 'UPDATE %s SET %s FROM json_populate_recordset(NULL::%s, %%s) AS v WHERE %s' % (
+						table, ','.join('%s=v.%s' % (c, c) for c in update_columns), table, join
+					)
+					params = [dumps(
+						[{column: _json_record_value(value) for column, value in zip(columns, row)} for row in batch],
+						ensure_ascii=False, allow_nan=False, default=str
+					)]
+				elif self.engine in ('mysql', 'mariadb'):
+					values = ' UNION ALL '.join(
+						['SELECT ' + ','.join('%%s AS %s' % c for c in columns)] +
+						['SELECT ' + ','.join(['%s'] * len(columns))] * (len(batch) - 1)
+					)
+					query = 'UPDATE %s JOIN (%s) AS v ON %s SET %s' % (
+						table, values, join, ','.join('%s.%s=v.%s' % (table, c, c) for c in update_columns)
+					)
+					params = [value for row in batch for value in row]
+				else:
+					query = 'UPDATE %s SET %s FROM %s JOIN (VALUES %s) AS v(%s) ON %s' % (
+						table, ','.join('%s=v.%s' % (c, c) for c in update_columns), table,
+						','.join(['(%s)' % ','.join(['%s'] * len(columns))] * len(batch)), ','.join(columns), join
+					)
+					params = [value for row in batch for value in row]
+				self._execute(query, params)
+				count += max(self.cursor().rowcount, 0)
+		return count
+
 	def delete(self, table: str, filters: dict = lambda: {}) -> int:
 		''' Executes a delete operation and returns the number of affected rows, specifying
 		a filters list, i.e. `{'a': 4, 'b': None}` will be translated into `WHERE A = 4 AND B = NULL`. '''
@@ -342,6 +688,32 @@ class SQL:
 		self.execute(query, params, commit=True)
 		return int(self.cursor().rowcount)
 
+	def delete_all(self, table: str, keys: Any, key_columns: List[str] = None) -> int:
+		''' Deletes many rows, given as a list of {column: value} dicts (or a DataFrame) with the
+		values of the columns that identify each row, or as a list of values (or tuples of values) of
+		the `key_columns`, i.e. `delete_all('users', [1, 2, 3], ['id'])`. They are deleted in batches
+		of `max_insertions` within a single transaction. Returns the number of affected rows. '''
+		columns, keys = _bulk_rows(keys, key_columns, required=True)
+		if columns is None:  # there are no keys
+			return 0
+		batch_size = self.max_insertions or 1000
+		if self.engine == 'mssql':
+			batch_size = min(batch_size, 2099 // len(columns))  # MS-SQL accepts 2100 parameters at most
+		count = 0
+		with self._transaction():
+			for batch in _batches(keys, batch_size):
+				if len(columns) == 1:
+					condition = '%s IN (%s)' % (columns[0], ','.join(['%s'] * len(batch)))
+				elif self.engine == 'mssql':  # MS-SQL doesn't support tuple comparisons
+					condition = ' OR '.join(['(%s)' % ' AND '.join('%s=%%s' % c for c in columns)] * len(batch))
+				else:
+					condition = '(%s) IN (%s)' % (
+						','.join(columns), ','.join(['(%s)' % ','.join(['%s'] * len(columns))] * len(batch))
+					)
+				self._execute('DELETE FROM %s WHERE %s' % (table, condition), [value for key in batch for value in key])
+				count += max(self.cursor().rowcount, 0)
+		return count
+
 	def escape(self, value: Any, is_literal: bool = True) -> str:
 		''' Escapes the given value for its injection into the SQL query. By default,
 		the data `is_literal=True`, which will wrap strings with quotes for its insertion. '''
@@ -350,18 +722,209 @@ class SQL:
 			if is_literal:
 				value = sql.quote(value)
 			else:
-				self.cursor()  # force initialization
-				value = sql.Identifier(value).as_string(self._connection)
+				value = sql.Identifier(value).as_string(self.connection())
 		else:
 			if value is None:
 				value = 'NULL'
 			else:
-				self.cursor()  # force initialization
-				value = self._connection.converter.escape(str(value))
+				value = self.connection().converter.escape(str(value))
 				if is_literal:
 					value = '"%s"' % value
 		return value
 
+def _bulk_rows(rows: Any, columns: List[str] = None, required: bool = False) -> tuple:
+	''' Returns the columns of the rows to bulk load and an iterator of their values as tuples.
+	Single values are taken as rows of one column. If the columns are `required`, rows given as
+	tuples or single values must come with their `columns`. '''
+	if hasattr(rows, 'itertuples') and hasattr(rows, 'columns'):  # i.e., a pandas DataFrame
+		if columns is None:
+			columns = [str(column) for column in rows.columns]
+		else:
+			rows = rows[columns]
+		return columns, rows.itertuples(index=False, name=None)
+	from itertools import chain
+	rows = iter(rows)
+	try:
+		first = next(rows)
+	except StopIteration:
+		return columns, iter(())
+	if isinstance(first, dict):
+		if columns is None:
+			columns = list(first.keys())
+		return columns, (tuple(row[column] for column in columns) for row in chain([first], rows))
+	assert columns is not None or not required, 'The `columns` of rows given as tuples or single values must be specified.'
+	if not isinstance(first, (tuple, list)):
+		return columns, ((row,) for row in chain([first], rows))
+	return columns, (tuple(row) for row in chain([first], rows))
+
+def _batches(rows: Any, size: int) -> Generator[list, None, None]:
+	''' Splits an iterable in lists of up to `size` elements. '''
+	from itertools import islice
+	rows = iter(rows)
+	while True:
+		batch = list(islice(rows, size))
+		if not batch:
+			return
+		yield batch
+
+def _last_rows(rows: list, positions: List[int]) -> list:
+	''' Keeps the last of the rows with the same values at the given positions (i.e., their key). '''
+	last = {}
+	for row in rows:
+		key = tuple(row[i] for i in positions)
+		last.pop(key, None)  # so that rows keep the order of their last occurrence
+		last[key] = row
+	return list(last.values())
+
+_infile_escapes = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'}
+def _infile_value(value: Any) -> str:
+	''' Formats a value for a `LOAD DATA INFILE` tab-separated file, where missing values (None,
+	NaN, NaT or `pandas.NA`) are NULL and binary values are written in hexadecimal. '''
+	if _is_missing(value):
+		return '\\N'
+	if isinstance(value, bool) or type(value).__name__ in ('bool', 'bool_'):  # including numpy booleans
+		return '1' if value else '0'
+	if isinstance(value, (bytes, bytearray, memoryview)):
+		return bytes(value).hex()
+	if isinstance(value, (dict, list)):
+		from json import dumps
+		value = dumps(value, ensure_ascii=False, separators=(',', ':'))
+	value = str(value)
+	if any(c in value for c in _infile_escapes):
+		value = ''.join(_infile_escapes.get(c, c) for c in value)
+	return value
+
+def _json_record_value(value: Any) -> Any:
+	''' Converts a value for `json_populate_recordset`, which parses JSON strings with the input
+	function of the column type: binary values use the hexadecimal `bytea` format, infinite floats
+	are written as PostgreSQL spells them and missing values are null. '''
+	if isinstance(value, (bytes, bytearray, memoryview)):
+		return '\\x' + bytes(value).hex()
+	if _is_missing(value):
+		return None
+	if isinstance(value, float) and value in (float('inf'), float('-inf')):
+		return 'Infinity' if value > 0 else '-Infinity'
+	return value
+
+def _is_missing(value: Any) -> bool:
+	''' Checks whether a value is None or a missing value of pandas or numpy. '''
+	if value is None or type(value).__name__ in ('NAType', 'NaTType'):
+		return True
+	try:
+		return bool(value != value)  # NaN and numpy NaT are the only values not equal to themselves
+	except (TypeError, ValueError):
+		return False
+
+class _SQLPool:
+	''' Bounded pool of connections shared by the threads of a pooled `SQL` connector. '''
+
+	def __init__(self, connect, ping, size: int, timeout: float = None, max_lifetime: float = None) -> None:
+		from collections import deque
+		from threading import Condition
+		assert size > 0, 'The pool size must be positive.'
+		self._connect, self._ping, self.size, self.timeout, self.max_lifetime = connect, ping, size, timeout, max_lifetime
+		self._idle, self._condition = deque(), Condition()
+		self.open, self.in_use, self.checkouts, self.waits, self.wait_seconds, self.reconnects, self.recycled = 0, 0, 0, 0, 0, 0, 0
+
+	def checkout(self) -> tuple:
+		''' Returns an idle connection (or a new one if the pool is not full) and its creation time,
+		waiting for one to be released otherwise. '''
+		from time import monotonic
+		start = monotonic()
+		with self._condition:
+			if not self._idle and self.open >= self.size:
+				self.waits += 1
+				while not self._idle and self.open >= self.size:
+					remaining = None if self.timeout is None else self.timeout - (monotonic() - start)
+					if remaining is not None and remaining <= 0 or not self._condition.wait(remaining):
+						raise TimeoutError('No connection was released in %s seconds.' % self.timeout)
+			connection, created = self._idle.pop() if self._idle else (None, None)
+			if connection is None:
+				self.open += 1
+			self.in_use += 1
+			self.checkouts += 1
+			self.wait_seconds += monotonic() - start
+		try:
+			if connection is not None and self.max_lifetime is not None and monotonic() - created > self.max_lifetime:
+				self._close(connection)
+				connection = None
+				with self._condition:
+					self.recycled += 1
+			if connection is not None and not self._ping(connection):
+				self._close(connection)
+				connection = None
+				with self._condition:
+					self.reconnects += 1
+			if connection is None:
+				connection, created = self._connect(), monotonic()
+		except BaseException:
+			with self._condition:
+				self.open -= 1
+				self.in_use -= 1
+				self._condition.notify()
+			raise
+		return connection, created
+
+	def release(self, connection, created: float, broken: bool = False) -> None:
+		''' Returns a connection to the pool, rolling back any transaction left open, or closes it if
+		it is `broken` (or can't be rolled back). '''
+		if not broken:
+			try:
+				connection.rollback()  # the next thread must not inherit an open transaction or snapshot
+			except Exception:
+				broken = True
+		with self._condition:
+			self.in_use -= 1
+			if broken:
+				self.open -= 1
+			else:
+				self._idle.append((connection, created))
+			self._condition.notify()
+		if broken:
+			self._close(connection)
+
+	def close(self) -> None:
+		''' Closes the idle connections. '''
+		with self._condition:
+			idle, self._idle = list(self._idle), type(self._idle)()
+			self.open -= len(idle)
+		for connection, _ in idle:
+			self._close(connection)
+
+	def _close(self, connection) -> None:
+		try:
+			connection.close()
+		except Exception:
+			pass
+
+	def stats(self) -> dict:
+		with self._condition:
+			return {
+				'size': self.size, 'open': self.open, 'idle': len(self._idle), 'in_use': self.in_use,
+				'checkouts': self.checkouts, 'waits': self.waits, 'wait_seconds': self.wait_seconds,
+				'average_wait_seconds': self.wait_seconds / self.checkouts if self.checkouts else 0,
+				'reconnects': self.reconnects, 'recycled': self.recycled
+			}
+
+class _SQLCheckout:
+	''' Connection taken from a pool by a thread, with its cursor. It goes back to the pool when
+	released or when the thread ends. '''
+
+	def __init__(self, pool: _SQLPool, cursor_settings: dict) -> None:
+		from weakref import finalize
+		self.connection, created = pool.checkout()
+		try:
+			self.cursor = self.connection.cursor(**cursor_settings)
+		except BaseException:
+			pool.release(self.connection, created, broken=True)
+			raise
+		self._pool, self._created = pool, created
+		self._finalizer = finalize(self, pool.release, self.connection, created)
+
+	def release(self, broken: bool = False) -> None:
+		if self._finalizer.detach() is not None:
+			self._pool.release(self.connection, self._created, broken)
+
 def _mysql_converter():
 	''' Simpler MySQL converter that returns some bytes as strings and decimals as floats. '''
 	from mysql.connector.constants import FieldFlag
@@ -1,4 +1,6 @@
-from typing import Any, Callable, Optional, Set
+from io import BufferedIOBase, RawIOBase
+from pickle import Pickler
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, Union
 
 def cwd() -> None:
 	''' Change the current directory to the base of relative paths to the directory
@@ -10,24 +12,47 @@ def cwd() -> None:
 	chdir(path)
 	return path
 
-_load_formats = 'bytes', 'csv', 'json', 'jsonl', 'pickle', 'string', 'table', 'yaml'
-def load(path: str, format: str = 'auto', encoding: str = 'utf-8', inner_args: list = None, inner_kwargs: dict = None) -> object:
-	''' Load a file in a given format. '''
-	format = detect_format(path, format, accept=_load_formats, default='string')
+_load_formats = 'bytes', 'csv', 'feather', 'json', 'jsonl', 'npy', 'npz', 'parquet', 'pickle', 'string', 'table', 'yaml'
+_load_path_formats = 'feather', 'npy', 'npz', 'parquet'
+_load_mmap_formats = 'bytes', 'feather', 'npy', 'parquet', 'string'
+def load(
+	path: str, format: str = 'auto', encoding: str = 'utf-8', inner_args: list = None,
+	inner_kwargs: dict = None, compression: str = 'auto', mmap: bool = False
+) -> object:
+	''' Load a file in a given format. Files with a compression extension stacked on top of the
+	format one (i.e., `data.jsonl.gz`) are decompressed on the fly, see `detect_compression`, and
+	members of zip, tar, rar and 7z archives can be read without extracting them by separating both
+	paths with an exclamation mark, i.e. `data.zip!inner/file.jsonl`. If `mmap` is set, bytes files
+	are returned as a read-only memory map and string files as a `MappedText`, so that they can be
+	sliced without reading them to memory; npy, feather and parquet files are memory-mapped by their
+	own readers. Columns of feather and parquet files can be selected with
+	`inner_kwargs={'columns': [...]}`, and parquet row groups can be skipped with pyarrow `filters`,
+	i.e. `inner_kwargs={'filters': [('year', '>=', 2020)]}`. npz files are returned as a
+	{name: array} dict. '''
+	compression, inner_path = detect_compression(path, compression, format)
+	format = detect_format(inner_path, format, accept=_load_formats, default='string')
 	args = [] if inner_args is None else inner_args
 	kwargs = {} if inner_kwargs is None else inner_kwargs
-	if format in ('string', 'jsonl'):
-		fp = open(path, 'r', encoding=encoding)
+	local = compression is None and _split_archive_path(path) is None
+	if mmap:
+		assert format in _load_mmap_formats, 'Only %s files can be memory-mapped.' % ', '.join(_load_mmap_formats)
+		assert local, 'Compressed files and archive members cannot be memory-mapped.'
+		if format in ('bytes', 'string'):
+			buffer = _mmap(path)
+			return buffer if format == 'bytes' else MappedText(buffer, encoding)
+	if format in _load_path_formats and local:
+		fp, source = None, path
+	elif format in ('string', 'jsonl'):
+		fp = source = _open(path, 'r', encoding=encoding, compression=compression)
 	else:
-		fp = open(path, 'rb')
+		fp = source = _open(path, 'rb', compression=compression)
 	if format in ('bytes', 'string'):
 		res = fp.read()
 	elif format == 'json':
-		from json import load as jload
-		res = jload(fp, *args, **kwargs)
+		res = _json_loads(args, kwargs)(fp.read())
 	elif format == 'jsonl':
-		from json import loads as jloads
-		res = [jloads(line.strip(), *args, **kwargs) for line in fp if line.strip()]
+		jloads = _json_loads(args, kwargs)
+		res = [jloads(line.strip()) for line in fp if line.strip()]
 	elif format == 'csv':
 		from pandas import read_csv
 		res = read_csv(fp, *args, **kwargs)
@@ -38,113 +63,722 @@ def load(path: str, format: str = 'auto', encoding: str = 'utf-8', inner_args: l
 		from pickle import load as pload
 		res = pload(fp, *args, **kwargs)
 	elif format == 'yaml':
-		from yaml import safe_load_all as yload
-		res = list(yload(fp, *args, **kwargs))
+		res = list(_yaml_load_all(fp, args, kwargs))
 		res = res[0] if len(res) == 1 else res
-	fp.close()
+	elif format in ('npy', 'npz'):
+		from numpy import load as nload
+		if mmap and 'mmap_mode' not in kwargs: kwargs['mmap_mode'] = 'r'
+		res = nload(source, *args, **kwargs)
+		if format == 'npz':
+			with res:  # read every array so that the file isn't left open
+				res = {name: res[name] for name in res.files}
+	elif format == 'feather':
+		_require_pyarrow()
+		from pyarrow.feather import read_table
+		if mmap and 'memory_map' not in kwargs: kwargs['memory_map'] = True
+		res = read_table(source, *args, **kwargs).to_pandas()
+	elif format == 'parquet':
+		_require_pyarrow()
+		from pyarrow.parquet import read_table
+		if mmap and 'memory_map' not in kwargs: kwargs['memory_map'] = True
+		res = read_table(source, *args, **kwargs).to_pandas()
+	if fp is not None:
+		fp.close()
 	return res
 
-def save(path: str, content: object, format: str = 'auto', encoding: str = 'utf-8', append: bool = False, inner_args: list = None, inner_kwargs: dict = None) -> None:
-	''' Saves a file to the given format. '''
-	format = detect_format(path, format, accept=_load_formats, default='string')
+def _require_pyarrow() -> None:
+	''' Fails with an explanatory error if pyarrow, used for feather and parquet files, is missing. '''
+	try:
+		import pyarrow
+	except ModuleNotFoundError:
+		raise ModuleNotFoundError('Missing pyarrow, required for feather and parquet files. Do `pip install pyarrow`.')
+
+def _mmap(path: str, copy: bool = False) -> Union[bytes, 'mmap']:
+	''' Maps a file to memory in read-only mode, or in copy-on-write mode if `copy` is set. Empty
+	files, which cannot be mapped, are returned as an empty bytes object. '''
+	from mmap import mmap, ACCESS_COPY, ACCESS_READ
+	with open(path, 'rb') as fp:
+		try:
+			return mmap(fp.fileno(), 0, access=ACCESS_COPY if copy else ACCESS_READ)
+		except ValueError:
+			return b''
+
+class MappedText:
+	''' Read-only list of lines over a memory-mapped text file, as returned by `load(path, mmap=True)`.
+	Lines are only decoded when accessed, and the index of line offsets is built on the first random
+	access, so iterating or slicing the raw `buffer` never copies the whole file. The encoding must
+	represent line breaks as `\\n` bytes, as UTF-8, ASCII or Latin-1 do. '''
+
+	def __init__(self, buffer, encoding: str = 'utf-8') -> None:
+		self.buffer, self.encoding = buffer, encoding
+		self._offsets = None
+
+	def _index(self):
+		if self._offsets is None:
+			from array import array
+			offsets = array('Q', [0])
+			pos = self.buffer.find(b'\n')
+			while pos != -1:
+				offsets.append(pos + 1)
+				pos = self.buffer.find(b'\n', pos + 1)
+			if offsets[-1] == len(self.buffer):
+				offsets.pop()
+			self._offsets = offsets
+		return self._offsets
+
+	def _line(self, start: int, end: int) -> str:
+		line = self.buffer[start:end]
+		if line.endswith(b'\n'): line = line[:-1]
+		if line.endswith(b'\r'): line = line[:-1]
+		return line.decode(self.encoding)
+
+	def __len__(self) -> int:
+		return len(self._index())
+
+	def __getitem__(self, index: Union[int, slice]) -> Union[str, list]:
+		offsets = self._index()
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(offsets)))]
+		if index < 0:
+			index += len(offsets)
+		if not 0 <= index < len(offsets):
+			raise IndexError('MappedText index out of range')
+		end = offsets[index + 1] if index + 1 < len(offsets) else len(self.buffer)
+		return self._line(offsets[index], end)
+
+	def __iter__(self) -> Generator[str, None, None]:
+		start = 0
+		while start < len(self.buffer):
+			end = self.buffer.find(b'\n', start)
+			end = len(self.buffer) if end == -1 else end + 1
+			yield self._line(start, end)
+			start = end
+
+	def __str__(self) -> str:
+		return self.buffer[:].decode(self.encoding)
+
+	def close(self) -> None:
+		''' Unmaps the underlying buffer. '''
+		if hasattr(self.buffer, 'close'):
+			self.buffer.close()
+
+_iter_load_formats = 'bytes', 'csv', 'jsonl', 'parquet', 'string', 'yaml'
+_iter_load_chunk_sizes = {'bytes': 2 ** 20, 'csv': 10 ** 4, 'parquet': 10 ** 4}
+def iter_load(
+	path: str, format: str = 'auto', encoding: str = 'utf-8', chunk_size: int = None,
+	inner_args: list = None, inner_kwargs: dict = None, compression: str = 'auto'
+) -> Generator[object, None, None]:
+	''' Lazily loads a file in a given format, keeping a bounded amount of it in memory. It yields
+	each parsed line of a jsonl file, each line of a string file (without the line break), each
+	document of a yaml file, a DataFrame of `chunk_size` rows at a time of a csv or parquet file and
+	blocks of `chunk_size` bytes of a bytes file. Parquet columns and row groups can be selected with
+	`inner_kwargs={'columns': [...], 'row_groups': [...]}`. Compressed files are decompressed on the
+	fly as in `load`. '''
+	compression, inner_path = detect_compression(path, compression, format)
+	format = detect_format(inner_path, format, accept=_iter_load_formats, default='string')
 	args = [] if inner_args is None else inner_args
 	kwargs = {} if inner_kwargs is None else inner_kwargs
-	if format in ('string', 'json', 'jsonl', 'yaml'):
-		fp = open(path, 'a' if append else 'w', encoding=encoding)
-	elif format in ('bytes', 'pickle'):
-		fp = open(path, 'ab' if append else 'wb')
+	if chunk_size is None:
+		chunk_size = _iter_load_chunk_sizes.get(format)
+	if format in ('string', 'jsonl'):
+		fp = _open(path, 'r', encoding=encoding, compression=compression)
 	else:
-		fp = None
-	if format in ('bytes', 'string'):
-		fp.write(content)
-	elif format in ('json', 'jsonl'):
-		from json import dumps as jdumps
-		if 'ensure_ascii' not in kwargs: kwargs['ensure_ascii'] = False
-		if format == 'json' and 'indent' not in kwargs: kwargs['indent'] = '\t'
-		if format[-1] == 'l':
-			fp.write('\n'.join(jdumps(elem, *args, **kwargs) for elem in content))
-		else:
-			fp.write(jdumps(content, *args, **kwargs))
-	elif format == 'pickle':
-		from pickle import dump as pdump
-		if 'protocol' not in kwargs: kwargs['protocol'] = 4
-		pdump(content, fp, *args, **kwargs)
+		fp = _open(path, 'rb', compression=compression)
+	with fp:
+		if format == 'bytes':
+			for chunk in iter(lambda: fp.read(chunk_size), b''):
+				yield chunk
+		elif format == 'string':
+			for line in fp:
+				yield line[:-1] if line.endswith('\n') else line
+		elif format == 'jsonl':
+			jloads = _json_loads(args, kwargs)
+			for line in fp:
+				line = line.strip()
+				if line:
+					yield jloads(line)
+		elif format == 'csv':
+			from pandas import read_csv
+			with read_csv(fp, *args, chunksize=chunk_size, **kwargs) as reader:
+				yield from reader
+		elif format == 'yaml':
+			yield from _yaml_load_all(fp, args, kwargs)
+		elif format == 'parquet':
+			_require_pyarrow()
+			from pyarrow.parquet import ParquetFile
+			for batch in ParquetFile(fp).iter_batches(chunk_size, *args, **kwargs):
+				yield batch.to_pandas()
+
+_load_many_executors = 'thread', 'process'
+def load_many(
+	paths: list, workers: int = None, executor: str = 'thread', ordered: bool = True,
+	chunk_size: int = 1, **kwargs
+) -> Generator[Tuple[str, object, Optional[Exception]], None, None]:
+	''' Loads many files in parallel with a pool of `workers` threads or processes, yielding a
+	`(path, content, error)` tuple per file as soon as it is loaded (or in the same order as `paths`
+	if `ordered`). A file that fails to load yields its exception as `error` instead of stopping the
+	batch. Processes are the fastest option for CPU-bound formats such as json or pickle, in which
+	case the paths are dispatched in chunks of `chunk_size`. The keyword arguments are sent to `load`. '''
+	from collections import deque
+	from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+	from itertools import islice
+	from os import cpu_count
+	assert executor in _load_many_executors, 'Accepted executor values are: %s.' % ', '.join(_load_many_executors)
+	if workers is None:
+		workers = cpu_count() or 1
+		if executor == 'thread': workers = min(32, workers + 4)
+	paths = iter(paths)
+	pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+	with pool_class(workers) as pool:
+		pending = deque() if ordered else set()
+		submit = pending.append if ordered else pending.add
+		for chunk in iter(lambda: list(islice(paths, chunk_size)), []):
+			submit(pool.submit(_load_many_chunk, chunk, kwargs))
+			if len(pending) >= workers * 2:
+				yield from _load_many_next(pending, ordered)
+		while pending:
+			yield from _load_many_next(pending, ordered)
+
+def _load_many_next(pending: Union['deque', set], ordered: bool) -> list:
+	''' Waits for the next pending chunk (or any of them, if not `ordered`) and returns its results. '''
+	from concurrent.futures import wait, FIRST_COMPLETED
+	if ordered:
+		return pending.popleft().result()
+	done, _ = wait(pending, return_when=FIRST_COMPLETED)
+	pending.difference_update(done)
+	return [res for future in done for res in future.result()]
+
+def _load_many_chunk(paths: list, kwargs: dict) -> list:
+	''' Loads a chunk of files, as used by `load_many`. '''
+	res = []
+	for path in paths:
+		try:
+			res.append((path, load(path, **kwargs), None))
+		except Exception as e:
+			res.append((path, None, e))
+	return res
+
+_save_batch_size = 10 ** 4
+def save(
+	path: str, content: object, format: str = 'auto', encoding: str = 'utf-8', append: bool = False,
+	inner_args: list = None, inner_kwargs: dict = None, atomic: bool = True, batch_size: int = _save_batch_size,
+	compression: str = 'auto', compression_level: int = None
+) -> None:
+	''' Saves a file to the given format. The content of string, bytes, jsonl and csv files can be
+	any iterable (i.e., a generator of lines, blocks, records or rows), which is consumed lazily and
+	written in batches of `batch_size` elements. Lines of string files are given without their line
+	break, as `iter_load` yields them, and blocks of bytes files are written as they are. Unless
+	`atomic` is disabled, the file is written to a temporary path and then renamed, so that readers
+	never see a partially written file. Appending writes directly to the end of the file. Files with
+	a compression extension stacked on top of the format one (i.e., `data.jsonl.gz`) are compressed
+	on the fly with the given `compression_level`. '''
+	assert _split_archive_path(path) is None, 'Cannot save files inside archives.'
+	compression, inner_path = detect_compression(path, compression, format)
+	format = detect_format(inner_path, format, accept=_load_formats, default='string')
+	args = [] if inner_args is None else inner_args
+	kwargs = {} if inner_kwargs is None else inner_kwargs
+	if format == 'table' and 'engine' not in kwargs:
+		kwargs['engine'] = _table_engine(inner_path)  # the written file might be a temporary one
+	options = format, encoding, append, batch_size, compression, compression_level, args, kwargs
+	if append or not atomic:
+		_save(path, content, *options)
+	else:
+		from os import remove, replace
+		from uuid import uuid4
+		temp = '%s.%s.tmp' % (path, uuid4().hex[:8])
+		try:
+			_save(temp, content, *options)
+			replace(temp, path)
+		except BaseException:
+			try:
+				remove(temp)
+			except OSError:
+				pass
+			raise
+
+def _table_engine(path: str) -> Optional[str]:
+	''' Returns the pandas engine to write a table to the given path, or None for the default (xlsx) one. '''
+	return 'odf' if path.lower().rsplit('.', 1)[-1] in ('odf', 'ods', 'odt') else None
+
+def _save(path, content, format, encoding, append, batch_size, compression, compression_level, args, kwargs):
+	''' Writes the content of a file in the given format, as used by `save`. '''
+	from itertools import islice
+	from os.path import getsize, isfile
+	assert not append or format not in _load_path_formats, 'Cannot append to %s files.' % format
+	assert compression is None or format != 'npz', 'npz files cannot be compressed on the fly, save them with `inner_kwargs={\'compressed\': True}` instead.'
+	existing = append and isfile(path) and getsize(path) > 0
+	options = {'compression': compression, 'compression_level': compression_level}
+	if format in ('string', 'json', 'jsonl', 'yaml'):
+		fp = _open(path, 'a' if append else 'w', encoding=encoding, **options)
 	elif format == 'csv':
-		from pandas import DataFrame
-		if 'index' not in kwargs: kwargs['index'] = False
 		if 'encoding' not in kwargs: kwargs['encoding'] = 'utf-8-sig'
-		DataFrame(content).to_csv(path, *args, **kwargs)
-	elif format == 'table':
-		from pandas import DataFrame
-		if 'index' not in kwargs: kwargs['index'] = False
-		DataFrame(content).to_excel(path, *args, **kwargs)
-	elif format == 'yaml':
-		from yaml import dump as ydump
-		ydump(content, fp, *args, **kwargs)
-	if fp is not None:
-		fp.close()
+		fp = _open(path, 'a' if append else 'w', encoding=kwargs.pop('encoding'), newline='', **options)
+	else:
+		fp = _open(path, 'ab' if append else 'wb', **options)
+	with fp:
+		if format in ('bytes', 'string'):
+			if isinstance(content, (str, bytes, bytearray, memoryview)):
+				fp.write(content)
+			elif format == 'string':
+				if existing and compression is None and not _ends_with_newline(path):
+					fp.write('\n')
+				content = iter(content)
+				for batch in iter(lambda: list(islice(content, batch_size)), []):
+					fp.writelines(line + '\n' for line in batch)
+			else:
+				content = iter(content)
+				for batch in iter(lambda: list(islice(content, batch_size)), []):
+					fp.writelines(batch)
+		elif format in ('json', 'jsonl'):
+			from json import dumps as jdumps
+			if 'ensure_ascii' not in kwargs: kwargs['ensure_ascii'] = False
+			jldumps = _jsonl_dumps(args, kwargs)
+			if format == 'json' and 'indent' not in kwargs: kwargs['indent'] = '\t'
+			if format[-1] == 'l':
+				if existing and compression is None and not _ends_with_newline(path):
+					fp.write('\n')
+				content = iter(content)
+				for batch in iter(lambda: list(islice(content, batch_size)), []):
+					fp.write(''.join(jldumps(elem) + '\n' for elem in batch))
+			else:
+				fp.write(jdumps(content, *args, **kwargs))
+		elif format == 'pickle':
+			from pickle import dump as pdump
+			if 'protocol' not in kwargs: kwargs['protocol'] = 5
+			pdump(content, fp, *args, **kwargs)
+		elif format == 'csv':
+			from pandas import DataFrame
+			if 'index' not in kwargs: kwargs['index'] = False
+			header = kwargs.pop('header', not existing)
+			if isinstance(content, DataFrame):
+				content.to_csv(fp, *args, header=header, **kwargs)
+			else:
+				content = iter(content)
+				for batch in iter(lambda: list(islice(content, batch_size)), []):
+					DataFrame(batch).to_csv(fp, *args, header=header, **kwargs)
+					header = False
+		elif format == 'table':
+			from pandas import DataFrame
+			if 'index' not in kwargs: kwargs['index'] = False
+			DataFrame(content).to_excel(fp, *args, **kwargs)
+		elif format == 'yaml':
+			from yaml import dump as ydump
+			if 'Dumper' not in kwargs and _codec_backend('yaml') == 'yaml.cyaml':
+				from yaml import CDumper
+				kwargs['Dumper'] = CDumper
+			ydump(content, fp, *args, **kwargs)
+		elif format == 'npy':
+			from numpy import save as nsave
+			nsave(fp, content, *args, **kwargs)
+		elif format == 'npz':
+			from numpy import savez, savez_compressed
+			nsave = savez_compressed if kwargs.pop('compressed', False) else savez
+			if isinstance(content, dict):
+				nsave(fp, *args, **content, **kwargs)
+			else:
+				nsave(fp, content, *args, **kwargs)
+		elif format in ('feather', 'parquet'):
+			_require_pyarrow()
+			from pyarrow import Table
+			if not isinstance(content, Table):
+				from pandas import DataFrame
+				if not isinstance(content, DataFrame): content = DataFrame(content)
+				content = Table.from_pandas(content, preserve_index=False)
+			if format == 'feather':
+				from pyarrow.feather import write_feather
+				write_feather(content, fp, *args, **kwargs)
+			else:
+				from pyarrow.parquet import write_table
+				write_table(content, fp, *args, **kwargs)
+
+_codec_backends = {
+	'json_loads': ('orjson', 'ujson', 'json'),
+	'json_dumps': ('ujson', 'json'),  # orjson is excluded as it writes NaN and Infinity as null
+	'yaml': ('yaml.cyaml', 'yaml'),
+}
+_codec_backend_cache = {}
+def _codec_backend(codec: str) -> str:
+	''' Returns the first installed module of the `_codec_backends` of a codec. '''
+	if codec not in _codec_backend_cache:
+		from importlib import import_module
+		for backend in _codec_backends[codec]:
+			try:
+				import_module(backend)
+				break
+			except ImportError:
+				pass
+		_codec_backend_cache[codec] = backend
+	return _codec_backend_cache[codec]
+
+def _json_loads(args: list, kwargs: dict) -> Callable:
+	''' Returns a function equivalent to `json.loads(text, *args, **kwargs)`, using the fastest
+	installed backend unless custom arguments are given. Texts rejected by the fast backend, such
+	as the ones with NaN literals, are parsed again by the standard library. '''
+	from json import loads
+	backend = _codec_backend('json_loads')
+	if args or kwargs or backend == 'json':
+		return lambda text: loads(text, *args, **kwargs)
+	if backend == 'orjson':
+		from orjson import loads as fast_loads
+	else:
+		from ujson import loads as fast_loads
+	def _json_loads_wrapper(text):
+		try:
+			return fast_loads(text)
+		except ValueError:
+			return loads(text)
+	return _json_loads_wrapper
+
+def _jsonl_dumps(args: list, kwargs: dict) -> Callable:
+	''' Returns a function equivalent to `json.dumps(obj, *args, **kwargs)` for jsonl lines, using the
+	fastest installed backend unless custom arguments are given. Objects rejected by the fast backend,
+	such as integers over 64 bits, are serialized by the standard library. '''
+	from json import dumps
+	if args or kwargs != {'ensure_ascii': False} or _codec_backend('json_dumps') == 'json':
+		return lambda obj: dumps(obj, *args, **kwargs)
+	from ujson import dumps as fast_dumps
+	def _jsonl_dumps_wrapper(obj):
+		try:
+			return fast_dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+		except (TypeError, ValueError, OverflowError):
+			return dumps(obj, *args, **kwargs)
+	return _jsonl_dumps_wrapper
+
+def _yaml_load_all(fp, args: list, kwargs: dict) -> Generator[object, None, None]:
+	''' Equivalent to `yaml.safe_load_all`, using the libyaml bindings when they are installed. '''
+	from yaml import load_all, safe_load_all
+	if args or kwargs or _codec_backend('yaml') == 'yaml':
+		return safe_load_all(fp, *args, **kwargs)
+	from yaml import CSafeLoader
+	return load_all(fp, Loader=CSafeLoader)
+
+def _open(path: str, mode: str, encoding: str = None, newline: str = None, compression: str = None, compression_level: int = None):
+	''' Opens a file like `open` does, transparently (de)compressing it when a compression format
+	from `_compression_formats` is given, and reading archive members given as `archive!member`. '''
+	member = _split_archive_path(path) if 'r' in mode else None
+	if compression is None and member is None:
+		return open(path, mode, encoding=encoding, newline=newline)
+	assert compression is None or compression in _compression_formats, 'Unknown compression "%s". Accepted compressions are %s.' % (
+		compression,
+		', '.join(_compression_formats)
+	)
+	if member is not None:
+		from io import TextIOWrapper
+		stream = _open_archive_member(*member)
+		if compression is not None:
+			stream = _ArchiveStream(_open(stream, 'rb', compression=compression), stream)
+		return stream if 'b' in mode else TextIOWrapper(stream, encoding=encoding, newline=newline)
+	if 'b' not in mode:
+		mode += 't'
+	options = {}
+	if compression == 'gzip':
+		from gzip import open as copen
+		if compression_level is not None: options['compresslevel'] = compression_level
+	elif compression == 'bzip2':
+		from bz2 import open as copen
+		if compression_level is not None: options['compresslevel'] = compression_level
+	elif compression == 'lzma':
+		from lzma import open as copen
+		if compression_level is not None and 'r' not in mode: options['preset'] = compression_level
+	return copen(path, mode, encoding=encoding, newline=newline, **options)
+
+_archive_formats = 'tar', 'zip', 'rar', '7zip'
+def _split_archive_path(path: str) -> Optional[Tuple[str, str]]:
+	''' Splits a path like `data.zip!inner/file.jsonl` into its archive and member paths, or returns
+	None if it does not point to an archive member. '''
+	from os.path import isfile
+	if not isinstance(path, str) or '!' not in path or isfile(path):
+		return None
+	pos = path.find('!')
+	while pos != -1:
+		archive = path[:pos]
+		if isfile(archive) and detect_format(archive, 'auto') in _archive_formats:
+			return archive, path[pos + 1:]
+		pos = path.find('!', pos + 1)
+	return None
+
+def _open_archive_member(archive: str, member: str) -> '_ArchiveStream':
+	''' Opens a member of an archive as a binary stream. Zip, tar and rar members are streamed
+	from the archive, while 7z members are decompressed to memory, as solid blocks must be read
+	from their start. '''
+	format = detect_format(archive, 'auto', accept=_archive_formats)
+	if format == 'zip':
+		from zipfile import ZipFile
+		container = ZipFile(archive)
+		stream = container.open(member)
+	elif format == 'tar':
+		from tarfile import open as open_tar
+		container = open_tar(archive)
+		stream = container.extractfile(member)
+		assert stream is not None, 'Member "%s" of "%s" is not a regular file.' % (member, archive)
+	elif format == 'rar':
+		from rarfile import RarFile
+		container = RarFile(archive)
+		stream = container.open(member)
+	elif format == '7zip':
+		from py7zr import SevenZipFile
+		container = SevenZipFile(archive, 'r')
+		try:
+			from py7zr.io import BytesIOFactory
+		except ModuleNotFoundError:  # py7zr < 1.0, which removed `read` in favor of extraction factories
+			stream = container.read(targets=[member])[member]
+		else:
+			from io import BytesIO
+			from sys import maxsize
+			factory = BytesIOFactory(maxsize)
+			container.extract(targets=[member], factory=factory)
+			if member not in factory.products:
+				raise KeyError('There is no member named "%s" in "%s".' % (member, archive))
+			buffer = factory.get(member)
+			buffer.seek(0)
+			stream = BytesIO(buffer.read())
+	return _ArchiveStream(stream, container)
+
+def archive_members(path: str) -> List[str]:
+	''' Lists the paths of the files inside a zip, tar, rar or 7z archive, which can be loaded
+	directly as `load(path + '!' + member)`. '''
+	format = detect_format(path, 'auto', accept=_archive_formats)
+	if format == 'zip':
+		from zipfile import ZipFile
+		with ZipFile(path) as container:
+			return [info.filename for info in container.infolist() if not info.is_dir()]
+	elif format == 'tar':
+		from tarfile import open as open_tar
+		with open_tar(path) as container:
+			return [info.name for info in container.getmembers() if info.isfile()]
+	elif format == 'rar':
+		from rarfile import RarFile
+		with RarFile(path) as container:
+			return [info.filename for info in container.infolist() if not info.is_dir()]
+	elif format == '7zip':
+		from py7zr import SevenZipFile
+		with SevenZipFile(path, 'r') as container:
+			return [info.filename for info in container.list() if not info.is_directory]
+
+class _ArchiveStream(BufferedIOBase):
+	''' Binary stream that closes the objects it depends on (i.e., its archive) along with it. '''
+
+	def __init__(self, stream, *owners) -> None:
+		self._stream, self._owners = stream, owners
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return self._stream.seekable()
+
+	def read(self, size: int = -1) -> bytes:
+		return self._stream.read(size)
+
+	def read1(self, size: int = -1) -> bytes:
+		return self._stream.read1(size) if hasattr(self._stream, 'read1') else self._stream.read(size)
+
+	def readline(self, size: int = -1) -> bytes:
+		return self._stream.readline(size)
+
+	def seek(self, offset: int, whence: int = 0) -> int:
+		return self._stream.seek(offset, whence)
+
+	def tell(self) -> int:
+		return self._stream.tell()
+
+	def close(self) -> None:
+		if not self.closed:
+			self._stream.close()
+			for owner in self._owners:
+				owner.close()
+		super().close()
+
+def _ends_with_newline(path: str) -> bool:
+	''' Checks whether the last byte of a file is a line break. '''
+	with open(path, 'rb') as fp:
+		fp.seek(-1, 2)
+		return fp.read(1) == b'\n'
 
 _decompress_formats = 'tar', 'zip', 'gzip', 'bzip2', 'rar', '7zip', 'lzma'
-def decompress(input_file: str, output_dir: str = None, format: str = 'auto') -> None:
-	''' Decompress the given file to the output directory regardless of its format. '''
+_decompress_buffer_size = 2 ** 20
+def decompress(
+	input_file: str, output_dir: str = None, format: str = 'auto', include: List[str] = None,
+	exclude: List[str] = None, workers: int = None, progress: Callable = None
+) -> List[str]:
+	''' Decompress the given file to the output directory regardless of its format, and returns the
+	paths of the extracted files. Members are streamed to disk in blocks of `_decompress_buffer_size`
+	bytes, and zip members are extracted in parallel by `workers` threads. Only the members matching
+	some `include` glob (if any) and no `exclude` glob are extracted. If `progress` is given, it is
+	called as `progress(done_bytes, total_bytes, bytes_per_second)` after each written block, where
+	`total_bytes` is None when the format does not tell it beforehand. '''
+	from os import cpu_count, makedirs
+	from os.path import basename, dirname, splitext
 	if output_dir is None:
-		from os.path import dirname
 		output_dir = dirname(input_file)
 	else:
-		from os import makedirs
 		makedirs(output_dir, exist_ok=True)
 	format = detect_format(input_file, format, accept=_decompress_formats)
+	selected = lambda name: _decompress_selected(name, include, exclude)
+	res = []
 	if format == 'zip':
+		from concurrent.futures import ThreadPoolExecutor
 		from zipfile import ZipFile
+		if workers is None: workers = min(32, (cpu_count() or 1) + 4)
 		with ZipFile(input_file, 'r') as i:
-			i.extractall(output_dir)
-	elif format == 'gzip':
-		from gzip import GzipFile
-		from os.path import join
-		from shutil import copyfileobj
-		o_dir = join(output_dir, input_file.rsplit('.', 1)[0])
-		with GzipFile(input_file, 'r') as i, open(o_dir, 'wb') as o:
-			copyfileobj(i, o)
+			infos = [info for info in i.infolist() if not info.is_dir() and selected(info.filename)]
+			tracker = _DecompressProgress(progress, sum(info.file_size for info in infos))
+			extract = lambda info: _decompress_copy(i.open(info), output_dir, info.filename, tracker)
+			with ThreadPoolExecutor(workers) as pool:
+				res = list(pool.map(extract, infos))
+	elif format in ('gzip', 'bzip2', 'lzma'):
+		name = splitext(basename(input_file))[0]
+		if selected(name):
+			tracker = _DecompressProgress(progress)
+			res.append(_decompress_copy(_open(input_file, 'rb', compression=format), output_dir, name, tracker))
 	elif format == 'rar':
 		from rarfile import RarFile
 		with RarFile(input_file, 'r') as i:
-			i.extractall(output_dir)
-	elif format == 'bzip2':
-		from bz2 import open as open_bz2
-		from shutil import copyfileobj
-		with open_bz2(input_file, 'r') as i, open(output_dir, 'wb') as o:
-			copyfileobj(i, o)
+			infos = [info for info in i.infolist() if not info.is_dir() and selected(info.filename)]
+			tracker = _DecompressProgress(progress, sum(info.file_size for info in infos))
+			for info in infos:
+				res.append(_decompress_copy(i.open(info), output_dir, info.filename, tracker))
 	elif format == 'tar':
+		import tarfile
 		from tarfile import open as open_tar
-		with open_tar(input_file) as i:
-			i.extractall(output_dir)
+		tracker = _DecompressProgress(progress)
+		with open_tar(input_file, 'r|*') as i:
+			for info in i:
+				if not selected(info.name):
+					continue
+				if info.isdir():
+					makedirs(_decompress_target(output_dir, info.name), exist_ok=True)
+				elif info.isfile():
+					res.append(_decompress_copy(i.extractfile(info), output_dir, info.name, tracker))
+					_decompress_attributes(res[-1], info)
+				else:  # links and special files are left to tarfile
+					_decompress_link(output_dir, info)
+					if hasattr(tarfile, 'data_filter'):
+						i.extract(info, output_dir, filter='data')
+					else:
+						i.extract(info, output_dir)
 	elif format == '7zip':
 		from py7zr import SevenZipFile
+		# members of solid 7z archives share compressed blocks, so they are extracted in a single pass
 		with SevenZipFile(input_file, 'r') as i:
-			i.extractall(output_dir)
-	elif format == 'lzma':
-		from lzma import open as open_lzma, decompress as lzdecompress
-		from shutil import copyfileobj
-		with open_lzma(input_file, 'r') as i, open(output_dir, 'wb') as o:
-			copyfileobj(lzdecompress(i), o)
+			infos = [info for info in i.list() if not info.is_directory and selected(info.filename)]
+			tracker = _DecompressProgress(progress, sum(info.uncompressed for info in infos))
+			res = [_decompress_target(output_dir, info.filename) for info in infos]
+			i.extract(output_dir, targets=[info.filename for info in infos])
+			tracker.add(tracker.total)
+	return res
+
+def _decompress_selected(name: str, include: List[str] = None, exclude: List[str] = None) -> bool:
+	''' Checks whether an archive member matches the include and exclude globs of `decompress`. '''
+	from fnmatch import fnmatch
+	if include is not None and not any(fnmatch(name, pattern) for pattern in include):
+		return False
+	return exclude is None or not any(fnmatch(name, pattern) for pattern in exclude)
+
+def _decompress_target(output_dir: str, name: str) -> str:
+	''' Returns the output path of an archive member, refusing those that would escape the output
+	directory through absolute paths, parent references or links extracted before. '''
+	from os.path import join, realpath, sep
+	root = realpath(output_dir)
+	target = realpath(join(root, name))
+	assert target.startswith(root + sep), 'Archive member "%s" would be extracted outside of "%s".' % (name, output_dir)
+	return target
+
+def _decompress_link(output_dir: str, info) -> None:
+	''' Refuses tar links whose path or target would be outside the output directory. '''
+	from os.path import dirname, join, realpath, sep
+	target = _decompress_target(output_dir, info.name)
+	if info.issym() or info.islnk():
+		root = realpath(output_dir)
+		# symbolic links are relative to their directory, hard links to the root of the archive
+		linked = realpath(join(dirname(target) if info.issym() else root, info.linkname))
+		assert linked == root or linked.startswith(root + sep), 'Archive link "%s" points outside of "%s".' % (info.name, output_dir)
+
+def _decompress_attributes(path: str, info) -> None:
+	''' Restores the mode and modification time of an extracted tar member, dropping the special
+	and group or other write bits as the tarfile `data` filter does. '''
+	from os import chmod, utime
+	mode = (info.mode | 0o600) & 0o755
+	if not mode & 0o100:
+		mode &= ~0o011  # only the owner decides whether a file is executable
+	chmod(path, mode)
+	utime(path, (info.mtime, info.mtime))
+
+def _decompress_copy(source, output_dir: str, name: str, tracker: '_DecompressProgress') -> str:
+	''' Streams an archive member to its output path, as used by `decompress`. '''
+	from os import makedirs
+	from os.path import dirname
+	target = _decompress_target(output_dir, name)
+	makedirs(dirname(target), exist_ok=True)
+	with source, open(target, 'wb') as fp:
+		for block in iter(lambda: source.read(_decompress_buffer_size), b''):
+			fp.write(block)
+			tracker.add(len(block))
+	return target
+
+class _DecompressProgress:
+	''' Thread-safe counter of the bytes written by `decompress` that reports them to a callback. '''
+
+	def __init__(self, callback: Callable = None, total: int = None) -> None:
+		from threading import Lock
+		from time import time
+		self.callback, self.total, self.done = callback, total, 0
+		self._lock, self._start = Lock(), time()
+
+	def add(self, size: int) -> None:
+		if self.callback is None:
+			return
+		from time import time
+		with self._lock:
+			self.done += size
+			elapsed = time() - self._start
+			self.callback(self.done, self.total, self.done / elapsed if elapsed else 0)
 
 _detect_format_exts = (
 	('bytes', ('bin', 'db', 'dat', 'blob', 'bytes')),
 	('csv', ('csv',)),
+	('feather', ('feather', 'arrow')),
 	('json', ('json', 'js')),
 	('jsonl', ('jsonl', 'jsl')),
+	('npy', ('npy',)),
+	('npz', ('npz',)),
+	('parquet', ('parquet', 'pq')),
 	('pickle', ('pickle', 'pk', 'pkl', 'pck', 'pcl')),
 	('string', ('txt', 'text', 'str')),
 	('table', ('xlsx', 'odf', 'ods', 'odt', 'xls', 'xlsb', 'xlsm')),
 	('yaml', ('yaml', 'yml')),
-	('tar', ('tar', 'tar-linux32', 'tar-linux64', 'tar.gz')),
+	('tar', ('tar', 'tar-linux32', 'tar-linux64', 'tar.gz', 'tgz', 'tar.bz2', 'tar.xz')),
 	('zip', ('zip', 'cbz')),
 	('gzip', ('gz', 'gzip', 'gunzip')),
 	('bzip2', ('bzip2', 'bz2')),
 	('rar', ('rar', 'cbr')),
 	('7zip', ('7z', '7zip')),
-	('lzma', ('lzip', 'lz')),
+	('lzma', ('xz', 'lzma', 'lzip', 'lz')),
 )
+_compression_formats = 'gzip', 'bzip2', 'lzma'
+_detect_compression_exts = (
+	('gzip', ('gz', 'gzip')),
+	('bzip2', ('bz2', 'bzip2')),
+	('lzma', ('xz', 'lzma')),
+)
+def detect_compression(path: str, compression: str = 'auto', format: str = 'auto') -> Tuple[Optional[str], str]:
+	''' Detects the compression of a file from its path, returning it along with the path without
+	the compression extension, i.e. `('gzip', 'data.jsonl')` for `data.jsonl.gz`. When detecting it
+	automatically, files are only considered compressed if the compression extension is stacked on
+	top of a known data format, so that `download.gz`, `backup.tar.gz` or any file read or written
+	in the bytes `format` are kept as they are. '''
+	name = path.lower()
+	for ext_compression, exts in _detect_compression_exts:
+		ext = next((ext for ext in exts if name.endswith('.' + ext)), None)
+		if ext is not None and compression in ('auto', ext_compression):
+			inner_path = path[:-len(ext) - 1]
+			if compression == 'auto':
+				inner_format = detect_format(inner_path, 'auto')
+				if format == 'bytes' or inner_format == 'bytes' or inner_format not in _load_formats:
+					break
+			return ext_compression, inner_path
+	return None if compression == 'auto' else compression, path
+
 def detect_format(path: str, format: str, accept: list = None, default: str = None) -> Optional[str]:
 	''' Detects the format of a file from its path. '''
 	if format == 'auto':
@@ -162,110 +796,878 @@ def detect_format(path: str, format: str, accept: list = None, default: str = No
 		)
 	return format
 
-def disk_cache(method=None, *, seconds: float = None, directory: str = '.cached/', identifier: str = None):
+def disk_cache(
+	method=None, *, seconds: float = None, directory: str = '.cached/', identifier: str = None,
+	max_bytes: int = None, stale_while_revalidate: bool = False, compress: bool = False
+):
 	''' The first time the decorated method is called, its result is stored as a pickle file, the
 	next call loads the cached result from the disk. The cached files are used indefinitely unless the
 	`seconds` lifespan is defined. The cached files are stored at `.cached` unless otherwise
-	specificed with the `directory` argument. The cache file identifier is generated from the
-	method name plus its arguments, unless otherwise specified with the `identifier` argument. '''
+	specificed with the `directory` argument, and the least recently used ones are evicted when they
+	take more than `max_bytes` (see `DiskCache`). The cache file identifier is a hash of the method
+	name plus its pickled arguments, unless otherwise specified with the `identifier` argument. The
+	decorated method gets `stats()` and `clear()` methods to inspect and empty the cache directory.
+	Concurrent calls with the same arguments, even from different processes, wait for the first one
+	to compute the result instead of computing it again. If `stale_while_revalidate` is set, expired
+	results are returned immediately while a background thread computes the new one. Large buffers
+	such as numpy arrays are stored apart and memory-mapped when loaded, and if `compress` is set, the
+	compressible parts of each result are compressed. Coroutine functions are supported too: the
+	cache is read and written in the default executor, and concurrent calls awaiting the same result
+	within an event loop share a single computation. '''
 	def decorator(method):
-		def wrapper(*args, **kwargs):
-			from hashlib import md5
-			from os import makedirs
-			from os.path import join, exists
-			from time import time
-			makedirs(directory, exist_ok=True)
-			# compute the cached file identifier
-			if identifier is None:
-				fname = '%s|%s|%s' % (
-					method.__name__,
-					','.join(map(str, args)),
-					','.join(map(lambda it: '%s:%s' % it, kwargs.items()))
-				)
-				fname = md5(fname.encode()).hexdigest()
-			else:
-				fname = identifier
-			fname = join(directory, str(fname))
-			# return the value, cached or not
-			res = None
-			now = time()
-			if exists(fname):
-				from pickle import load as pload
-				with open(fname, 'rb') as fp:
-					save_time, value = pload(fp)
-				if seconds is None or now - save_time < seconds:
-					res = value
-			if res is None:
-				from pickle import dump as pdump
-				res = method(*args, **kwargs)
-				with open(fname, 'wb') as fp:
-					pdump((now, res), fp)
-			return res
+		from functools import wraps
+		from inspect import iscoroutinefunction
+		from time import perf_counter
+		cache = DiskCache(directory, max_bytes, compress=compress, name=_cache_name(method))
+
+		if iscoroutinefunction(method):
+			inflight = {}
+
+			@wraps(method)
+			async def wrapper(*args, **kwargs):
+				from asyncio import ensure_future, get_running_loop
+				from functools import partial
+				loop = get_running_loop()
+				key = _disk_cache_key(method, args, kwargs) if identifier is None else _disk_cache_key(identifier)
+				status, res = await loop.run_in_executor(None, cache.lookup, key, seconds)
+				if status == 'fresh':
+					return res
+
+				async def compute():
+					lock = cache.lock(key)
+					await loop.run_in_executor(None, lock.acquire)
+					try:
+						status, res = await loop.run_in_executor(None, partial(cache.lookup, key, seconds, count=False))
+						if status != 'fresh':
+							start = perf_counter()
+							res = await method(*args, **kwargs)
+							cache.computed(perf_counter() - start)
+							await loop.run_in_executor(None, cache.set, key, res)
+						return res
+					finally:
+						lock.release()
+				if status == 'stale' and stale_while_revalidate:
+					ensure_future(_async_coalesce(inflight, key, compute))
+					return res
+				return await _async_coalesce(inflight, key, compute)
+		else:
+			@wraps(method)
+			def wrapper(*args, **kwargs):
+				key = _disk_cache_key(method, args, kwargs) if identifier is None else _disk_cache_key(identifier)
+				status, res = cache.lookup(key, seconds)
+				if status == 'fresh':
+					return res
+				if status == 'stale' and stale_while_revalidate:
+					lock = cache.lock(key)
+					if lock.acquire(blocking=False):
+						from threading import Thread
+						Thread(target=_disk_cache_refresh, args=(cache, key, lock, method, args, kwargs), daemon=True).start()
+					return res
+				with cache.lock(key):
+					status, res = cache.lookup(key, seconds, count=False)  # it might have been computed meanwhile
+					if status != 'fresh':
+						start = perf_counter()
+						res = method(*args, **kwargs)
+						cache.computed(perf_counter() - start)
+						cache.set(key, res)
+				return res
+		wrapper.cache, wrapper.stats, wrapper.clear = cache, cache.stats, cache.clear
 		return wrapper
 	if method:
 		return decorator(method)
 	else:
 		return decorator
 
+def _disk_cache_refresh(cache: 'DiskCache', key: str, lock: '_FileLock', method: Callable, args: tuple, kwargs: dict) -> None:
+	''' Computes and stores a new value for an expired entry, releasing its lock when done. '''
+	from time import perf_counter
+	try:
+		start = perf_counter()
+		res = method(*args, **kwargs)
+		cache.computed(perf_counter() - start)
+		cache.set(key, res)
+	finally:
+		lock.release()
+
+class DiskCache:
+	''' Persistent store of pickled values, as used by `disk_cache`. Each entry is stored in a
+	subdirectory named after the first characters of its key, and a sqlite index tracks the size and
+	last access of the entries to evict the least recently used ones when they take more than
+	`max_bytes`. The index is shared by every store (and process) using the same directory. Values
+	are written to a temporary file and then renamed, so readers never load partially written ones,
+	and replaced values keep their files until the new ones are in place. A value that cannot be read
+	counts as a miss, and is replaced by the next `set` rather than deleted by the reader.
+	Values are pickled with protocol 5, storing the buffers over `buffer_threshold` bytes (such as
+	the data of numpy arrays) in separate files that are memory-mapped in copy-on-write mode when
+	loaded, so loading them does not read or copy them. If `compress` is set, the pickle and buffers
+	that seem compressible from a sample are stored compressed with zlib, and thus are not mapped.
+	The index records the `name` of the store that wrote each entry, so that stores sharing a
+	directory report their own entries and bytes. '''
+	INDEX = 'index.sqlite'
+	COMPRESSION_SAMPLE = 2 ** 16
+
+	def __init__(
+		self, directory: str = '.cached/', max_bytes: int = None, buffer_threshold: int = 2 ** 20,
+		compress: bool = False, name: str = None
+	) -> None:
+		from threading import local
+		self.directory, self.max_bytes = directory, max_bytes
+		self.buffer_threshold, self.compress = buffer_threshold, compress
+		self.hits, self.misses, self.evictions = 0, 0, 0
+		self.computes, self.compute_seconds = 0, 0
+		self._local = local()
+		self._owner = name
+		self.name = _cache_register(self, name)
+
+	def computed(self, seconds: float) -> None:
+		''' Records the time it took to compute a missing value, to estimate the time saved by hits. '''
+		self.computes += 1
+		self.compute_seconds += seconds
+
+	def _index(self):
+		''' Returns the index connection of the current thread and process, creating it if needed. '''
+		from os import getpid
+		if getattr(self._local, 'pid', None) != getpid():
+			from os import makedirs
+			from os.path import join
+			from sqlite3 import connect, OperationalError
+			makedirs(self.directory, exist_ok=True)
+			index = connect(join(self.directory, self.INDEX), timeout=60, isolation_level=None)
+			index.execute('PRAGMA journal_mode=WAL')
+			index.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, created REAL, accessed REAL, owner TEXT)')
+			if 'owner' not in [column[1] for column in index.execute('PRAGMA table_info(entries)')]:
+				try:
+					index.execute('ALTER TABLE entries ADD COLUMN owner TEXT')  # indexes created before owners were recorded
+				except OperationalError:  # another process added it meanwhile
+					pass
+			index.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+			index.execute('CREATE INDEX IF NOT EXISTS entries_owner ON entries (owner)')
+			self._local.index, self._local.pid = index, getpid()
+		return self._local.index
+
+	def path(self, key: str) -> str:
+		''' Returns the path of the file of an entry. '''
+		from os.path import join
+		return join(self.directory, key[:2], key)
+
+	def get(self, key: str, seconds: float = None) -> Tuple[bool, Any]:
+		''' Returns a `(found, value)` pair for a key, where entries older than `seconds` are not found. '''
+		status, value = self.lookup(key, seconds)
+		return status == 'fresh', value
+
+	def lookup(self, key: str, seconds: float = None, count: bool = True) -> Tuple[Optional[str], Any]:
+		''' Returns a `(status, value)` pair for a key, where the status is "fresh", "stale" if the
+		entry is older than `seconds`, or None if it is missing. Fresh entries count as hits and the
+		rest as misses, unless `count` is disabled. '''
+		from pickle import UnpicklingError
+		from time import time
+		from zlib import error as ZlibError
+		index = self._index()
+		status, value = None, None
+		row = index.execute('SELECT created FROM entries WHERE key = ?', (key,)).fetchone()
+		if row is not None:
+			try:
+				value = self._read(key)
+				index.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time(), key))
+				status = 'fresh' if seconds is None or time() - row[0] < seconds else 'stale'
+			except (OSError, EOFError, ValueError, UnpicklingError, ZlibError):  # evicted, replaced or corrupted meanwhile
+				pass
+		if count:
+			if status == 'fresh':
+				self.hits += 1
+			else:
+				self.misses += 1
+		return status, value
+
+	def lock(self, key: str) -> '_FileLock':
+		''' Returns an inter-process lock for an entry, which `disk_cache` holds while computing it. '''
+		return _FileLock(self.path(key) + '.lock')
+
+	def _read(self, key: str) -> Any:
+		''' Loads the value of an entry, whose file contains a compression flag, a line with the kind
+		of each out-of-band buffer ("m" for mapped, "z" for compressed) and their generation, and the
+		pickled value. '''
+		from pickle import loads
+		from zlib import decompress
+		path = self.path(key)
+		with open(path, 'rb') as fp:
+			compressed = fp.read(1) == b'z'
+			layout, _, generation = fp.readline()[:-1].decode().partition(' ')
+			data = fp.read()
+		if compressed:
+			data = decompress(data)
+		buffers = [
+			_mmap(name, copy=True) if kind == 'm' else decompress(load(name, 'bytes'))
+			for name, kind in zip(self._buffer_paths(path, layout, generation), layout)
+		]
+		return loads(data, buffers=buffers)
+
+	@staticmethod
+	def _buffer_paths(path: str, layout: str, generation: str) -> List[str]:
+		''' Returns the paths of the out-of-band buffers of an entry file. Each `set` writes them under
+		a new generation, so that they never overwrite the ones of the value being replaced. '''
+		prefix = '%s.%s' % (path, generation) if generation else path  # entries written before generations
+		return ['%s.%d%s' % (prefix, i, '.z' if kind == 'z' else '') for i, kind in enumerate(layout)]
+
+	def _current_buffers(self, path: str) -> List[str]:
+		''' Returns the paths of the out-of-band buffers referenced by the current file of an entry. '''
+		try:
+			with open(path, 'rb') as fp:
+				fp.read(1)
+				layout, _, generation = fp.readline()[:-1].decode().partition(' ')
+		except (OSError, UnicodeDecodeError):
+			return []
+		return self._buffer_paths(path, layout, generation)
+
+	def set(self, key: str, value: Any) -> None:
+		''' Stores a value, evicting the least recently used entries if the store gets too big. '''
+		from os import makedirs, remove
+		from os.path import dirname
+		from pickle import dumps
+		from time import time
+		from uuid import uuid4
+		from zlib import compress
+		path = self.path(key)
+		makedirs(dirname(path), exist_ok=True)
+		replaced, generation = self._current_buffers(path), uuid4().hex[:8]
+		buffers = []
+		def buffer_callback(buffer):
+			if buffer.raw().nbytes < self.buffer_threshold:
+				return True  # small buffers are kept in-band
+			buffers.append(buffer.raw())
+			return False
+		data = dumps(value, protocol=5, buffer_callback=buffer_callback)
+		size, layout = 0, ''
+		for i, buffer in enumerate(buffers):
+			if self.compress and self._compressible(buffer):
+				buffer = compress(buffer, 1)
+				layout += 'z'
+			else:
+				layout += 'm'
+			save(self._buffer_paths(path, layout, generation)[i], buffer, 'bytes')
+			size += buffer.nbytes if isinstance(buffer, memoryview) else len(buffer)
+		compressed = self.compress and self._compressible(data)
+		if compressed:
+			data = compress(data, 1)
+		header = (b'z' if compressed else b'p') + layout.encode() + b' ' + generation.encode() + b'\n'
+		save(path, (header, data), 'bytes')  # the rename replaces the previous value at once
+		size += len(header) + len(data)
+		now = time()
+		self._index().execute(
+			'INSERT OR REPLACE INTO entries (key, size, created, accessed, owner) VALUES (?, ?, ?, ?, ?)',
+			(key, size, now, now, self._owner)
+		)
+		for name in replaced:
+			try:
+				remove(name)
+			except OSError:  # already removed, or still mapped by a reader on Windows
+				pass
+		if self.max_bytes is not None:
+			self.evict(self.max_bytes)
+
+	def _compressible(self, data) -> bool:
+		''' Checks whether a sample of some data shrinks at least a 10% when compressed. '''
+		from zlib import compress
+		sample = memoryview(data)[:self.COMPRESSION_SAMPLE]
+		return len(compress(sample, 1)) < .9 * sample.nbytes
+
+	def _remove(self, key: str) -> None:
+		''' Removes the files of an entry, including its out-of-band buffers. '''
+		from glob import escape, glob
+		from os import remove
+		path = self.path(key)
+		for name in [path] + glob(escape(path) + '.*'):
+			if not name.endswith('.lock') and not name.endswith('.tmp'):
+				try:
+					remove(name)
+				except FileNotFoundError:
+					pass
+
+	def delete(self, key: str) -> None:
+		''' Removes an entry from the store. '''
+		self._remove(key)
+		self._index().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+	def evict(self, max_bytes: int) -> None:
+		''' Removes the least recently used entries until the store takes `max_bytes` at most. '''
+		index = self._index()
+		total = index.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+		if total <= max_bytes:
+			return
+		for key, size in index.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+			if total <= max_bytes:
+				break
+			self.delete(key)
+			total -= size
+			self.evictions += 1
+
+	def clear(self) -> None:
+		''' Removes every entry written by this store (or by any other with the same name), along with
+		their lock files, keeping the ones of other stores sharing the directory. '''
+		from os import remove
+		for key, in self._index().execute('SELECT key FROM entries WHERE owner IS ?', (self._owner,)).fetchall():
+			self.delete(key)
+			try:
+				remove(self.path(key) + '.lock')
+			except OSError:
+				pass
+
+	def stats(self) -> dict:
+		''' Returns the number of entries and bytes written by this store (or by any other with the
+		same name), along with the hits, misses and evictions of this instance. '''
+		entries, size = self._index().execute(
+			'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE owner IS ?', (self._owner,)
+		).fetchone()
+		return {
+			'directory': self.directory, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+			'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+			'computes': self.computes, 'compute_seconds': self.compute_seconds
+		}
+
+class _FileLock:
+	''' Exclusive lock between processes and threads, held on a file with `flock` (or with
+	`msvcrt.locking` on Windows). It can be used as a context manager. '''
+
+	def __init__(self, path: str) -> None:
+		self.path, self._fp = path, None
+
+	def acquire(self, blocking: bool = True) -> bool:
+		''' Acquires the lock, waiting for it unless `blocking` is disabled. Returns whether it was acquired. '''
+		from os import makedirs, name as os_name
+		from os.path import abspath, dirname
+		makedirs(dirname(abspath(self.path)), exist_ok=True)
+		fp = open(self.path, 'a+b')
+		try:
+			if os_name == 'nt':
+				from msvcrt import locking, LK_NBLCK
+				from time import sleep
+				fp.seek(0)
+				while True:
+					try:
+						locking(fp.fileno(), LK_NBLCK, 1)
+						break
+					except OSError:
+						if not blocking: raise
+						sleep(.05)
+			else:
+				from fcntl import flock, LOCK_EX, LOCK_NB
+				flock(fp.fileno(), LOCK_EX if blocking else LOCK_EX | LOCK_NB)
+		except OSError:
+			fp.close()
+			return False
+		self._fp = fp
+		return True
+
+	def release(self) -> None:
+		''' Releases the lock. '''
+		from os import name as os_name
+		if os_name == 'nt':
+			from msvcrt import locking, LK_UNLCK
+			self._fp.seek(0)
+			locking(self._fp.fileno(), LK_UNLCK, 1)
+		self._fp.close()
+		self._fp = None
+
+	def __enter__(self) -> '_FileLock':
+		self.acquire()
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.release()
+
+def _disk_cache_key(method, args: tuple = (), kwargs: dict = None) -> str:
+	''' Hashes the qualified name of a method (or an identifier) along with its pickled arguments.
+	Numpy arrays and pandas objects are hashed from their data buffers, and arguments that cannot be
+	pickled are hashed from their representation. '''
+	from hashlib import blake2b
+	from pickle import PicklingError
+	from types import SimpleNamespace
+	name = '%s.%s' % (method.__module__, method.__qualname__) if callable(method) else str(method)
+	arguments = args, sorted((kwargs or {}).items())
+	digest = blake2b(name.encode(), digest_size=16)
+	try:
+		_DiskCacheKeyPickler(SimpleNamespace(write=digest.update), protocol=5).dump(arguments)
+	except (PicklingError, TypeError, AttributeError):
+		digest = blake2b((name + repr(arguments)).encode(), digest_size=16)
+	return digest.hexdigest()
+
+class _DiskCacheKeyPickler(Pickler):
+	''' Pickler that replaces numpy arrays and pandas objects by a hash of their data. '''
+
+	def reducer_override(self, obj):
+		from hashlib import blake2b
+		kind = '%s.%s' % (type(obj).__module__.split('.')[0], type(obj).__name__)
+		if kind == 'numpy.ndarray' and not obj.dtype.hasobject:
+			from numpy import ascontiguousarray
+			data = ascontiguousarray(obj).reshape(-1).view('u1')  # datetime64 and timedelta64 cannot export a buffer
+			digest = blake2b(data, digest_size=16).hexdigest()
+			return tuple, ((kind, obj.dtype.str, obj.shape, digest),)
+		if kind in ('pandas.DataFrame', 'pandas.Series'):
+			from pandas.util import hash_pandas_object
+			try:
+				hashes = hash_pandas_object(obj, index=True).values
+			except TypeError:  # i.e., cells with unhashable values
+				return NotImplemented
+			digest = blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+			columns = list(obj.columns) if kind == 'pandas.DataFrame' else obj.name
+			return tuple, ((kind, columns, str(obj.dtypes), digest),)
+		return NotImplemented
+
 _mem_cache_global = {}
 def mem_cache(
 	method=None, *, key: Callable = None, maxsize: int = None, is_global: bool = False,
-	global_name: str = None
+	global_name: str = None, seconds: float = None, max_bytes: int = None, policy: str = 'lru',
+	sizer: Callable = None
 ):
 	''' Decorator to cache the output of a method. It is indexed by its arguments
 	unless the `key` argument is specified, in which case `key(*args, **kwargs)`
-	will be called to get the indexing key. If `maxsize` is defined, it is bounded
-	as an LRU cache with `maxsize` elements at most. If `is_global` is defined,
-	the cache will be stored globally, so that it can be shared accross multiple
-	methods of multiple instances of a class. A `global_name` can be
-	defined to identify the method; otherwise, the method name will be used. '''
-	if key is None:
-		key = lambda *args, **kwargs: frozenset(args + tuple(kwargs.items()))
+	will be called to get the indexing key. If `maxsize` or `max_bytes` are defined, it is
+	bounded to that many elements or bytes (measured with `sizer`, or `profiling.deep_size`
+	by default), evicting them with the given `policy`: "lru" (least recently used), "lfu"
+	(least frequently used) or "arc" (adaptive replacement). If `seconds` is defined, results
+	expire after that time. If `is_global` is defined, the cache will be stored globally, so
+	that it can be shared accross multiple methods of multiple instances of a class. A
+	`global_name` can be defined to identify the method; otherwise, the method name will be
+	used. The decorated method gets `cache_info()` and `cache_clear()` methods. Coroutine
+	functions cache their awaited result, and concurrent calls with the same key within an event
+	loop await a single computation. '''
 	if method is None:
-		return lambda method: mem_cache(method, key=key, maxsize=maxsize, is_global=is_global, global_name=global_name)
+		return lambda method: mem_cache(
+			method, key=key, maxsize=maxsize, is_global=is_global, global_name=global_name,
+			seconds=seconds, max_bytes=max_bytes, policy=policy, sizer=sizer
+		)
+	from functools import wraps
+	from inspect import iscoroutinefunction
+	from time import perf_counter
+	if key is None:
+		key = _mem_cache_key
 	if is_global:
 		if global_name is None: global_name = method.__name__
-		cache, cache_usage = _mem_cache_global.get(global_name, ({}, []))
+		if global_name not in _mem_cache_global:
+			_mem_cache_global[global_name] = MemCache(maxsize, max_bytes, seconds, policy, sizer, name=global_name)
+		cache = _mem_cache_global[global_name]
 	else:
-		cache, cache_usage = {}, []
+		cache = MemCache(maxsize, max_bytes, seconds, policy, sizer, name=_cache_name(method))
 
-	def _mem_cache(method, key, maxsize):
-		from functools import wraps
-		if maxsize is None:
-			@wraps(method)
-			def _mem_cache_wrapper(*args, **kwargs):
-				k = key(*args, **kwargs)
-				if k in cache: return cache[k]
-				res = method(*args, **kwargs)
-				cache[k] = res
+	if iscoroutinefunction(method):
+		inflight = {}
+
+		@wraps(method)
+		async def _mem_cache_wrapper(*args, **kwargs):
+			k = key(*args, **kwargs)
+			found, res = cache.get(k)
+			if found:
 				return res
-		else:
-			@wraps(method)
-			def _mem_cache_wrapper(*args, **kwargs):
-				k = key(*args, **kwargs)
-				if k in cache:
-					res = cache[k]
-					cache_usage.remove(k)
-				else:
-					res = method(*args, **kwargs)
-					cache[k] = res
-					if len(cache) > maxsize:
-						elem = cache_usage.pop(-1)
-						del cache[elem]
-				cache_usage.insert(0, k)
+
+			async def compute():
+				start = perf_counter()
+				res = await method(*args, **kwargs)
+				cache.computed(perf_counter() - start)
+				cache.set(k, res)
 				return res
-		return _mem_cache_wrapper
-	return _mem_cache(method, key, maxsize)
+			return await _async_coalesce(inflight, k, compute)
+	else:
+		@wraps(method)
+		def _mem_cache_wrapper(*args, **kwargs):
+			k = key(*args, **kwargs)
+			found, res = cache.get(k)
+			if not found:
+				start = perf_counter()
+				res = method(*args, **kwargs)
+				cache.computed(perf_counter() - start)
+				cache.set(k, res)
+			return res
+	_mem_cache_wrapper.cache = cache
+	_mem_cache_wrapper.cache_info, _mem_cache_wrapper.cache_clear = cache.info, cache.clear
+	return _mem_cache_wrapper
+
+async def _async_coalesce(inflight: dict, key: Any, compute: Callable) -> Any:
+	''' Awaits the task computing `key` in the running event loop, starting `compute()` unless it is
+	already in flight, so concurrent callers share it. Cancelling a caller does not cancel the task. '''
+	from asyncio import ensure_future, get_running_loop, shield
+	k = get_running_loop(), key
+	task = inflight.get(k)
+	if task is None:
+		task = inflight[k] = ensure_future(compute())
+		task.add_done_callback(lambda _: inflight.pop(k, None))
+	return await shield(task)
+
+_mem_cache_kwargs_mark = object()
+def _mem_cache_key(*args, **kwargs) -> Any:
+	''' Default `mem_cache` key, which keeps the position of the arguments and falls back to their
+	pickle (or representation) when they are not hashable. Keyword arguments follow a marker, as in
+	`functools._make_key`, so they never collide with positional ones. '''
+	k = args + (_mem_cache_kwargs_mark,) + tuple(sorted(kwargs.items())) if kwargs else args
+	try:
+		hash(k)
+	except TypeError:
+		from pickle import dumps, PicklingError
+		try:
+			k = dumps(k, protocol=5)
+		except (PicklingError, TypeError, AttributeError):
+			k = repr(k)
+	return k
+
+def _mem_cache_size(value: Any) -> int:
+	''' Default `mem_cache` sizer, which measures values with `profiling.deep_size`. '''
+	from simpler.profiling import deep_size
+	try:
+		return deep_size(value)
+	except TypeError:  # i.e., classes, functions and modules
+		from sys import getsizeof
+		return getsizeof(value)
+
+_mem_cache_policies = 'lru', 'lfu', 'arc'
+class MemCache:
+	''' Thread-safe in-memory store, as used by `mem_cache`. It holds `maxsize` entries and
+	`max_bytes` (measured with `sizer`) at most, evicting them with a "lru", "lfu" or "arc" policy
+	in constant time, and its entries expire after `seconds`. '''
+
+	def __init__(
+		self, maxsize: int = None, max_bytes: int = None, seconds: float = None, policy: str = 'lru',
+		sizer: Callable = None, name: str = None
+	) -> None:
+		from threading import RLock
+		assert policy in _mem_cache_policies, 'Accepted policy values are: %s.' % ', '.join(_mem_cache_policies)
+		self.maxsize, self.max_bytes, self.seconds, self.policy = maxsize, max_bytes, seconds, policy
+		self.sizer = _mem_cache_size if sizer is None else sizer
+		self._lock = RLock()
+		self.clear()
+		self.name = _cache_register(self, name)
+
+	def computed(self, seconds: float) -> None:
+		''' Records the time it took to compute a missing value, to estimate the time saved by hits. '''
+		with self._lock:
+			self.computes += 1
+			self.compute_seconds += seconds
+
+	def get(self, key: Any, count: bool = True) -> Tuple[bool, Any]:
+		''' Returns a `(found, value)` pair for a key, counting a hit or a miss unless `count` is disabled. '''
+		from time import monotonic
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry[1] is not None and entry[1] <= monotonic():
+				self._remove(key)
+				entry = None
+			if entry is None:
+				if count:
+					self.misses += 1
+				return False, None
+			self._policy.hit(key)
+			if count:
+				self.hits += 1
+			return True, entry[0]
+
+	def set(self, key: Any, value: Any) -> None:
+		''' Stores a value, evicting other entries if the cache gets too big. '''
+		from time import monotonic
+		size = 0 if self.max_bytes is None else self.sizer(value)
+		expiration = None if self.seconds is None else monotonic() + self.seconds
+		with self._lock:
+			if key in self._entries:
+				self._remove(key)
+			self._entries[key] = value, expiration, size
+			self.bytes += size
+			self._policy.add(key)
+			while self._entries and (
+				(self.maxsize is not None and len(self._entries) > self.maxsize) or
+				(self.max_bytes is not None and self.bytes > self.max_bytes)
+			):
+				self._remove(self._policy.evict(), evicted=True)
+				self.evictions += 1
+
+	def _remove(self, key: Any, evicted: bool = False) -> None:
+		if not evicted:
+			self._policy.remove(key)
+		self.bytes -= self._entries.pop(key)[2]
+
+	def clear(self) -> None:
+		''' Removes every entry and resets the statistics. '''
+		with self._lock:
+			self._entries = {}
+			self._policy = {'lru': _LRUPolicy, 'lfu': _LFUPolicy, 'arc': _ARCPolicy}[self.policy](self.maxsize)
+			self.hits, self.misses, self.evictions, self.bytes = 0, 0, 0, 0
+			self.computes, self.compute_seconds = 0, 0
+
+	def info(self) -> dict:
+		''' Returns the hits, misses, evictions, entries and bytes of the cache along with its bounds
+		and the number of values computed and the seconds it took. '''
+		return {
+			'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+			'entries': len(self._entries), 'bytes': self.bytes, 'maxsize': self.maxsize,
+			'max_bytes': self.max_bytes, 'policy': self.policy, 'computes': self.computes,
+			'compute_seconds': self.compute_seconds
+		}
+
+class _LRUPolicy:
+	''' Evicts the least recently used key. '''
+
+	def __init__(self, maxsize: int = None) -> None:
+		from collections import OrderedDict
+		self._order = OrderedDict()
+
+	def add(self, key: Any) -> None:
+		self._order[key] = None
+
+	def hit(self, key: Any) -> None:
+		self._order.move_to_end(key)
+
+	def remove(self, key: Any) -> None:
+		del self._order[key]
+
+	def evict(self) -> Any:
+		return self._order.popitem(last=False)[0]
+
+class _LFUPolicy:
+	''' Evicts the least frequently used key, and the least recently used one among them. '''
+
+	def __init__(self, maxsize: int = None) -> None:
+		self._counts, self._buckets, self._min = {}, {}, 1
+
+	def _push(self, key: Any, count: int) -> None:
+		from collections import OrderedDict
+		self._counts[key] = count
+		self._buckets.setdefault(count, OrderedDict())[key] = None
+
+	def _pop(self, key: Any) -> int:
+		count = self._counts.pop(key)
+		bucket = self._buckets[count]
+		del bucket[key]
+		if not bucket:
+			del self._buckets[count]
+		return count
+
+	def add(self, key: Any) -> None:
+		self._push(key, 1)
+		self._min = 1
+
+	def hit(self, key: Any) -> None:
+		count = self._pop(key)
+		self._push(key, count + 1)
+		if self._min == count and count not in self._buckets:
+			self._min = count + 1
+
+	def remove(self, key: Any) -> None:
+		self._pop(key)
+
+	def evict(self) -> Any:
+		if self._min not in self._buckets:
+			self._min = min(self._buckets)
+		key = next(iter(self._buckets[self._min]))
+		self._pop(key)
+		return key
+
+class _ARCPolicy:
+	''' Adaptive replacement policy, which balances the recently used keys seen once (t1) and more
+	than once (t2) depending on the hits of the history of the keys recently evicted from each one
+	(b1 and b2). '''
+
+	def __init__(self, maxsize: int = None) -> None:
+		from collections import OrderedDict
+		self._maxsize, self._p = maxsize, 0
+		self._t1, self._t2, self._b1, self._b2 = OrderedDict(), OrderedDict(), OrderedDict(), OrderedDict()
+
+	def _capacity(self) -> int:
+		return self._maxsize if self._maxsize is not None else max(len(self._t1) + len(self._t2), 1)
+
+	def add(self, key: Any) -> None:
+		if key in self._b1:
+			self._p = min(self._capacity(), self._p + max(len(self._b2) // len(self._b1), 1))
+			del self._b1[key]
+			self._t2[key] = None
+		elif key in self._b2:
+			self._p = max(0, self._p - max(len(self._b1) // len(self._b2), 1))
+			del self._b2[key]
+			self._t2[key] = None
+		else:
+			self._t1[key] = None
+
+	def hit(self, key: Any) -> None:
+		if key in self._t1:
+			del self._t1[key]
+			self._t2[key] = None
+		else:
+			self._t2.move_to_end(key)
+
+	def remove(self, key: Any) -> None:
+		if key in self._t1:
+			del self._t1[key]
+		else:
+			del self._t2[key]
+
+	def evict(self) -> Any:
+		if self._t1 and (len(self._t1) > self._p or not self._t2):
+			key = self._t1.popitem(last=False)[0]
+			self._b1[key] = None
+		else:
+			key = self._t2.popitem(last=False)[0]
+			self._b2[key] = None
+		for ghosts in (self._b1, self._b2):
+			while len(ghosts) > self._capacity():
+				ghosts.popitem(last=False)
+		return key
 
 def clear_global_mem_cache(global_name: str = None):
 	''' Clears the global memory cache. '''
 	if global_name is None:
-		_mem_cache_global.clear()
+		for cache in _mem_cache_global.values():
+			cache.clear()
+	elif global_name in _mem_cache_global:
+		_mem_cache_global[global_name].clear()
+
+def tiered_cache(
+	method=None, *, memory_maxsize: int = None, memory_max_bytes: int = None, disk_max_bytes: int = None,
+	seconds: float = None, directory: str = '.cached/', policy: str = 'lru', write_behind: bool = False
+):
+	''' Decorator to cache the output of a method both in memory, as `mem_cache` does, and on disk,
+	as `disk_cache` does, using the same key for both tiers. Results found on disk are promoted to
+	memory (where they expire `seconds` after being promoted), and new results are stored on disk
+	right away or, if `write_behind` is set, by a background thread. The decorated method gets a
+	`cache_info()` method with the statistics of each tier and a `cache_clear()` one. '''
+	def decorator(method):
+		from functools import wraps
+		from time import perf_counter
+		name = _cache_name(method)
+		memory = MemCache(memory_maxsize, memory_max_bytes, seconds, policy, name=name + ':memory')
+		disk = DiskCache(directory, disk_max_bytes, name=name + ':disk')
+		writer = _DiskCacheWriter(disk) if write_behind else None
+
+		@wraps(method)
+		def wrapper(*args, **kwargs):
+			key = _disk_cache_key(method, args, kwargs)
+			found, res = memory.get(key)
+			if found:
+				return res
+			status, res = disk.lookup(key, seconds)
+			if status != 'fresh':
+				with disk.lock(key):
+					# it might have been computed meanwhile, and still be waiting to be written to disk
+					found, res = memory.get(key, count=False)
+					if found:
+						return res
+					status, res = disk.lookup(key, seconds, count=False)
+					if status != 'fresh':
+						start = perf_counter()
+						res = method(*args, **kwargs)
+						elapsed = perf_counter() - start
+						memory.computed(elapsed)
+						disk.computed(elapsed)
+						if writer is None:
+							disk.set(key, res)
+						else:
+							writer.put(key, res)
+					memory.set(key, res)  # before releasing the lock, so waiting calls find it
+					return res
+			memory.set(key, res)
+			return res
+
+		def cache_clear():
+			memory.clear()
+			if writer is not None:
+				writer.flush()
+			disk.clear()
+		wrapper.cache_info = lambda: {'memory': memory.info(), 'disk': disk.stats()}
+		wrapper.cache_clear = cache_clear
+		return wrapper
+	if method:
+		return decorator(method)
 	else:
-		_mem_cache_global.pop(global_name, None)
+		return decorator
+
+class _DiskCacheWriter:
+	''' Background thread that stores values in a `DiskCache`, as used by `tiered_cache`. Pending
+	values are written before the interpreter exits. '''
+
+	def __init__(self, cache: DiskCache) -> None:
+		from atexit import register
+		from queue import Queue
+		from threading import Thread
+		self.cache, self.queue = cache, Queue()
+		Thread(target=self._run, daemon=True).start()
+		register(self.flush)
+
+	def put(self, key: str, value: Any) -> None:
+		''' Queues a value to be stored. '''
+		self.queue.put((key, value))
+
+	def flush(self) -> None:
+		''' Waits until every queued value has been stored. '''
+		self.queue.join()
+
+	def _run(self) -> None:
+		from traceback import print_exc
+		while True:
+			key, value = self.queue.get()
+			try:
+				self.cache.set(key, value)
+			except Exception:
+				print_exc()
+			finally:
+				self.queue.task_done()
+
+_cache_registry = None
+def _cache_register(cache: Any, name: str = None) -> str:
+	''' Adds a cache to the registry used by `cache_report`, under a unique name that is returned. '''
+	global _cache_registry
+	from weakref import WeakValueDictionary
+	if _cache_registry is None:
+		_cache_registry = WeakValueDictionary()
+	base = name = '%s@%x' % (type(cache).__name__, id(cache)) if name is None else name
+	i = 1
+	while name in _cache_registry:
+		i += 1
+		name = '%s#%d' % (base, i)
+	_cache_registry[name] = cache
+	return name
+
+def _cache_name(method: Callable) -> str:
+	''' Default registry name of the cache of a decorated method. '''
+	return '%s.%s' % (method.__module__, method.__qualname__)
+
+def cache_report(show: bool = False) -> Dict[str, dict]:
+	''' Returns the statistics of every live cache created by `mem_cache`, `disk_cache`,
+	`tiered_cache` or directly with `MemCache` and `DiskCache`, indexed by their name (the module and
+	name of the decorated method, by default). Along with the hits, misses, evictions, entries and
+	bytes of each cache, it includes its hit ratio, the average seconds it took to compute a missing
+	value and an estimation of the seconds saved by its hits. The report can be dumped as JSON, and
+	if `show` is set, it is printed too. '''
+	res = {}
+	for name, cache in sorted(list(_cache_registry.items()) if _cache_registry else []):
+		stats = cache.info() if isinstance(cache, MemCache) else cache.stats()
+		requests = stats['hits'] + stats['misses']
+		average = stats['compute_seconds'] / stats['computes'] if stats['computes'] else None
+		res[name] = {
+			'kind': 'memory' if isinstance(cache, MemCache) else 'disk', **stats,
+			'hit_ratio': stats['hits'] / requests if requests else None,
+			'average_compute_seconds': average,
+			'saved_seconds': None if average is None else stats['hits'] * average
+		}
+	if show:
+		from simpler.terminal import cprint
+		for name, stats in res.items():
+			ratio = stats['hit_ratio']
+			cprint(name, '(%s)' % stats['kind'], fg='cyan', end=' ')
+			cprint(
+				'-' if ratio is None else '%.1f%%' % (100 * ratio),
+				fg='default' if ratio is None else 'green' if ratio >= .8 else 'yellow' if ratio >= .5 else 'red',
+				end=' '
+			)
+			print('%d hits, %d misses, %d evictions, %d entries, %d bytes, %s saved' % (
+				stats['hits'], stats['misses'], stats['evictions'], stats['entries'], stats['bytes'],
+				'-' if stats['saved_seconds'] is None else '%.3fs' % stats['saved_seconds']
+			))
+	return res
 
 def size(file) -> int:
-	''' A way to see the size of a file without loading it to memory. '''
+	''' A way to see the size of a file without loading it to memory. It also accepts in-memory
+	and memory-mapped buffers, such as the ones returned by `load(path, mmap=True)`. '''
+	from mmap import mmap
+	if isinstance(file, MappedText):
+		file = file.buffer
+	if isinstance(file, memoryview):
+		return file.nbytes
+	if isinstance(file, (bytes, bytearray, mmap)):
+		return len(file)
 	if hasattr(file, 'content_length') and file.content_length:
 		return file.content_length
 	try:
@@ -302,15 +1704,124 @@ _find_hidden_compressed_signatures = {
 	# 'tar': b'\x1f\x9d',
 	# 'bz2': b'\x42\x5a\x68',
 }
-def find_hidden_compressed(path: str, byte_limit: int = None) -> Set[str]:
-	''' Recursively looks for compressed file signatures in a file. '''
-	with open(path, 'rb') as fp:
-		data = fp.read() if byte_limit is None else fp.read(byte_limit)
-	return {
-		ftype
-		for ftype, signature in _find_hidden_compressed_signatures.items()
-		if data.find(signature) != -1
-	}
+def find_hidden_compressed(path: Union[str, bytes, 'mmap', MappedText], byte_limit: int = None) -> Set[str]:
+	''' Recursively looks for compressed file signatures in a file, given its path or an already
+	loaded (or memory-mapped) buffer. See `scan_hidden_compressed` to get their offsets. '''
+	return {name for _, name, _ in scan_hidden_compressed(path, byte_limit)}
+
+_scan_hidden_compressed_chunk_size = 2 ** 22
+_scan_hidden_compressed_regex = None
+def scan_hidden_compressed(
+	path: Union[str, bytes, 'mmap', MappedText], byte_limit: int = None, recursive: bool = False
+) -> List[Tuple[int, str, dict]]:
+	''' Finds every occurrence of the `_find_hidden_compressed_signatures` in a file (or buffer),
+	returning `(offset, signature, embedded)` tuples sorted by offset. Files are memory-mapped and all
+	the signatures are matched in a single pass. If `recursive`, the embedded zip archives and xz
+	streams that can be opened are scanned too, and `embedded` maps each of their member names (or
+	an empty string for xz streams) to the `(offset, signature)` pairs found in it. '''
+	if isinstance(path, str):
+		data = _mmap(path)
+	elif isinstance(path, MappedText):
+		data = path.buffer
+	else:
+		data = path
+	try:
+		end = len(data) if byte_limit is None else min(byte_limit, len(data))
+		res = []
+		for match in _scan_hidden_compressed_pattern().finditer(data, 0, end):
+			offset, signature = match.start(), _scan_hidden_compressed_names[match.group(1)]
+			embedded = _scan_hidden_compressed_embedded(data, offset, signature) if recursive else {}
+			res.append((offset, signature, embedded))
+		return res
+	finally:
+		if isinstance(path, str) and hasattr(data, 'close'):  # empty files are not mapped
+			data.close()
+
+def scan_hidden_compressed_many(paths: List[str], workers: int = None, **kwargs) -> Generator[Tuple[str, list], None, None]:
+	''' Scans many files with `scan_hidden_compressed` in a pool of `workers` processes, yielding
+	`(path, results)` pairs in the same order as `paths`. '''
+	from concurrent.futures import ProcessPoolExecutor
+	from functools import partial
+	paths = list(paths)
+	with ProcessPoolExecutor(workers) as pool:
+		yield from zip(paths, pool.map(partial(scan_hidden_compressed, **kwargs), paths))
+
+_scan_hidden_compressed_names = {signature: name for name, signature in _find_hidden_compressed_signatures.items()}
+def _scan_hidden_compressed_pattern():
+	''' Compiles the signatures into a single pattern that matches all of them at every offset. '''
+	global _scan_hidden_compressed_regex
+	if _scan_hidden_compressed_regex is None:
+		from re import compile, escape, DOTALL
+		signatures = sorted(_find_hidden_compressed_signatures.values(), key=len, reverse=True)
+		_scan_hidden_compressed_regex = compile(b'(?=(%s))' % b'|'.join(map(escape, signatures)), DOTALL)
+	return _scan_hidden_compressed_regex
+
+def _scan_hidden_compressed_stream(stream) -> List[Tuple[int, str]]:
+	''' Finds the signatures in a non-seekable stream, reading it in overlapping chunks. '''
+	from lzma import LZMAError
+	pattern = _scan_hidden_compressed_pattern()
+	overlap = max(map(len, _find_hidden_compressed_signatures.values())) - 1
+	res, tail, position = [], b'', 0
+	try:
+		for chunk in iter(lambda: stream.read(_scan_hidden_compressed_chunk_size), b''):
+			data = tail + chunk
+			for match in pattern.finditer(data):
+				if match.end(1) > len(tail):  # the ones within the tail were found in the last chunk
+					res.append((position - len(tail) + match.start(), _scan_hidden_compressed_names[match.group(1)]))
+			position += len(chunk)
+			tail = data[-overlap:]
+	except (EOFError, OSError, LZMAError):  # i.e., corrupted data or trailing garbage after an xz stream
+		pass
+	return res
+
+def _scan_hidden_compressed_embedded(data, offset: int, signature: str) -> dict:
+	''' Scans the members of the zip archive or xz stream found at a given offset of a buffer. '''
+	res = {}
+	if signature == 'zip':
+		from zipfile import BadZipFile, ZipFile
+		try:
+			with _BufferReader(data, offset) as reader, ZipFile(reader) as container:
+				for info in container.infolist():
+					if not info.is_dir():
+						with container.open(info) as stream:
+							res[info.filename] = _scan_hidden_compressed_stream(stream)
+		except (BadZipFile, EOFError, OSError, NotImplementedError, RuntimeError):
+			pass
+	elif signature == 'xz':
+		from lzma import open as open_lzma
+		with _BufferReader(data, offset) as reader, open_lzma(reader) as stream:
+			res[''] = _scan_hidden_compressed_stream(stream)
+	return res
+
+class _BufferReader(RawIOBase):
+	''' Seekable read-only file over a buffer from a given offset, which avoids copying it. '''
+
+	def __init__(self, buffer, start: int = 0) -> None:
+		self._view, self._position = memoryview(buffer)[start:], 0
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return True
+
+	def readinto(self, target) -> int:
+		size = max(0, min(len(target), len(self._view) - self._position))
+		target[:size] = self._view[self._position:self._position + size]
+		self._position += size
+		return size
+
+	def seek(self, offset: int, whence: int = 0) -> int:
+		self._position = (0, self._position, len(self._view))[whence] + offset
+		return self._position
+
+	def tell(self) -> int:
+		return self._position
+
+	def close(self) -> None:
+		''' Releases the view, so that the underlying memory map can be closed. '''
+		self._view.release()
+		super().close()
 
 _tvshow_rename_regex = None
 def tvshow_rename(path: str) -> None:
@@ -329,53 +1840,185 @@ def tvshow_rename(path: str) -> None:
 			rename(file, new_name)
 
 _directory_compare_ignored = ('.class', '.metadata', '.recommenders', '.pyc', '.git', '.svn', '.cached', '__pycache__')
-def directory_compare(old: str, new: str, kind: str = 'dir', ignored: list = _directory_compare_ignored) -> None:
+def directory_compare(
+	old: str, new: str, kind: str = 'dir', ignored: list = _directory_compare_ignored, show: bool = True,
+	old_manifest: str = None, new_manifest: str = None, workers: int = None
+) -> Dict[str, list]:
 	''' Compares the files in two directories (old and new) to detect files that have been created,
-	deleted, changed or updated, ignoring the specified files. '''
-	def children(path):
-		from os import listdir
-		from os.path import isdir, islink, join
-		res = {}
-		for child in listdir(path):
-			if not any(child.endswith(ext) for ext in ignored):
-				full = join(path, child)
-				is_dir = 'dir' if isdir(full) else 'file'
-				if not islink(full):  # symbolic links are ignored in the comparison
-					res[(is_dir, child)] = full
-		return res
+	deleted, modified or moved, ignoring the specified files and symbolic links. Returns a dict with
+	the `created`, `deleted` and `modified` paths relative to each directory, and the `moved`
+	`(old path, new path)` pairs, which are also printed if `show` is set. Files of the same size are
+	compared by their blake2 hashes, computed in parallel by `workers` threads. If manifest paths
+	are given, the hashes are stored there and only the files whose size or modification time has
+	changed since are hashed again in the next comparison (see `directory_manifest`). '''
+	from os.path import join
+	res = {'created': [], 'deleted': [], 'modified': [], 'moved': []}
 	if kind == 'file':
 		from filecmp import cmp
 		if not cmp(old, new, shallow=False):
-			print('Modified\tfile\t%s' % new)
+			res['modified'].append(new)
 	else:
-		old_childs, new_childs = children(old), children(new)
-		for child in old_childs:
-			if child not in new_childs:
-				print('Deleted \t%s\t%s' % (child[0], old_childs[child]))
-		for child in new_childs:
-			if child not in old_childs:
-				print('Created \t%s\t%s' % (child[0], new_childs[child]))
+		old_files = _directory_manifest_scan(old, old_manifest, ignored)
+		new_files = _directory_manifest_scan(new, new_manifest, ignored)
+		deleted = [path for path in old_files if path not in new_files]
+		created = [path for path in new_files if path not in old_files]
+		common = [path for path in new_files if path in old_files and old_files[path][0] == new_files[path][0]]
+		created_sizes = {new_files[path][0] for path in created}
+		deleted_sizes = {old_files[path][0] for path in deleted}
+		_directory_manifest_hash(old, old_files, common + [path for path in deleted if old_files[path][0] in created_sizes], workers)
+		_directory_manifest_hash(new, new_files, common + [path for path in created if new_files[path][0] in deleted_sizes], workers)
+		if old_manifest is not None: _directory_manifest_save(old_manifest, old_files)
+		if new_manifest is not None: _directory_manifest_save(new_manifest, new_files)
+		res['modified'] = [
+			path for path in new_files
+			if path in old_files and (path not in common or old_files[path][2] != new_files[path][2])
+		]
+		created_hashes = {}
+		for path in created:
+			if new_files[path][2] is not None:
+				created_hashes.setdefault(new_files[path][2], []).append(path)
+		for path in deleted:
+			candidates = created_hashes.get(old_files[path][2])
+			if candidates:
+				res['moved'].append((path, candidates.pop(0)))
 			else:
-				directory_compare(old_childs[child], new_childs[child], child[0])
+				res['deleted'].append(path)
+		moved = {path for _, path in res['moved']}
+		res['created'] = [path for path in created if path not in moved]
+	if show:
+		base_old, base_new = ('', '') if kind == 'file' else (old, new)
+		for path in res['deleted']:
+			print('Deleted \tfile\t%s' % join(base_old, path))
+		for path in res['created']:
+			print('Created \tfile\t%s' % join(base_new, path))
+		for path in res['modified']:
+			print('Modified\tfile\t%s' % join(base_new, path))
+		for old_path, new_path in res['moved']:
+			print('Moved   \tfile\t%s -> %s' % (join(base_old, old_path), join(base_new, new_path)))
+	return res
+
+def directory_manifest(path: str, manifest: str = None, ignored: list = _directory_compare_ignored, workers: int = None) -> Dict[str, tuple]:
+	''' Returns a `{relative path: (size, modification time in ns, blake2 hash)}` dict of the files
+	in a directory, hashing them in parallel by `workers` threads. If a `manifest` path is given, it
+	is loaded to reuse the hashes of the files whose size and modification time have not changed,
+	and then overwritten with the updated manifest. '''
+	files = _directory_manifest_scan(path, manifest, ignored)
+	_directory_manifest_hash(path, files, list(files), workers)
+	if manifest is not None:
+		_directory_manifest_save(manifest, files)
+	return {path: tuple(entry) for path, entry in files.items()}
+
+def _directory_manifest_scan(root: str, manifest: str = None, ignored: list = _directory_compare_ignored) -> Dict[str, list]:
+	''' Lists the size and modification time of the files in a directory with `os.scandir`, keeping
+	the hashes of the previous manifest for the files that have not changed since. '''
+	from os import scandir
+	from os.path import exists
+	previous = {}
+	if manifest is not None and exists(manifest):
+		previous = load(manifest, detect_format(manifest, 'auto', default='pickle'))
+	files, pending = {}, ['']
+	while pending:
+		relative = pending.pop()
+		with scandir(root + '/' + relative if relative else root) as entries:
+			for entry in entries:
+				if any(entry.name.endswith(ext) for ext in ignored) or entry.is_symlink():
+					continue
+				path = relative + '/' + entry.name if relative else entry.name
+				if entry.is_dir():
+					pending.append(path)
+				else:
+					stat = entry.stat()
+					known = previous.get(path)
+					same = known is not None and tuple(known[:2]) == (stat.st_size, stat.st_mtime_ns)
+					files[path] = [stat.st_size, stat.st_mtime_ns, known[2] if same else None]
+	return files
+
+def _directory_manifest_hash(root: str, files: dict, paths: list, workers: int = None) -> None:
+	''' Computes in parallel the missing hashes of the given paths of a manifest. '''
+	from concurrent.futures import ThreadPoolExecutor
+	from os.path import join
+	paths = [path for path in paths if files[path][2] is None]
+	with ThreadPoolExecutor(workers) as pool:
+		for path, digest in zip(paths, pool.map(lambda path: _file_hash(join(root, path)), paths)):
+			files[path][2] = digest
+
+def _directory_manifest_save(manifest: str, files: dict) -> None:
+	''' Stores a manifest in the format given by its extension, or as a pickle by default. '''
+	save(manifest, {path: tuple(entry) for path, entry in files.items()}, detect_format(manifest, 'auto', default='pickle'))
+
+def _file_hash(path: str) -> str:
+	''' Returns the blake2 hash of a file, reading it in blocks. '''
+	from hashlib import blake2b
+	digest = blake2b(digest_size=16)
+	with open(path, 'rb') as fp:
+		for block in iter(lambda: fp.read(_decompress_buffer_size), b''):
+			digest.update(block)
+	return digest.hexdigest()
 
+_import_from_path_cache = {}
 def import_from_path(path: str, name: str, module_name: str = '.') -> Any:
-	''' Loads the script at the specified path and returns an object given its name. '''
+	''' Loads the script at the specified path and returns an object given its name. The loaded
+	module is reused by later calls until the script is modified. '''
 	from importlib.util import spec_from_file_location, module_from_spec
-	from os.path import exists
+	from os import stat
+	from os.path import abspath, exists
 	if exists(path):
-		spec = spec_from_file_location(module_name, path)
-		module = module_from_spec(spec)
-		spec.loader.exec_module(module)
+		path = abspath(path)
+		stats = stat(path)
+		stamp = stats.st_mtime_ns, stats.st_size
+		cached = _import_from_path_cache.get((path, module_name))
+		if cached is not None and cached[0] == stamp:
+			module = cached[1]
+		else:
+			spec = spec_from_file_location(module_name, path)
+			module = module_from_spec(spec)
+			spec.loader.exec_module(module)  # compiled bytecode is reused from __pycache__
+			_import_from_path_cache[path, module_name] = stamp, module
 		if name in module.__dict__:
 			return module.__dict__[name]
 
-def run_notebook(path: str) -> None:
-	''' Runs a notebook and returns the result. '''
-	source = ''
-	for cell in load(path, 'json')['cells']:
-		if cell['cell_type'] == 'code':
-			source += ''.join(line for line in cell['source'] if not line.startswith('%')) + '\n'
-	return exec(source, globals(), locals())
+def run_notebook(path: str, cache_directory: str = None) -> None:
+	''' Runs a notebook and returns the result. Its compiled code is reused by later calls until
+	the notebook is modified, and if `cache_directory` is defined, it is stored there so that other
+	processes don't need to compile it again. '''
+	return exec(_run_notebook_code(path, cache_directory), globals(), locals())
+
+_run_notebook_cache = {}
+def _run_notebook_code(path: str, cache_directory: str = None) -> Any:
+	''' Returns the compiled code of the cells of a notebook, from memory or `cache_directory` if
+	they were compiled since the notebook was last modified. '''
+	from importlib.util import MAGIC_NUMBER
+	from marshal import dumps, loads
+	from os import makedirs, stat
+	from os.path import abspath, basename, exists, join
+	path = abspath(path)
+	stats = stat(path)
+	stamp = stats.st_mtime_ns, stats.st_size
+	cached = _run_notebook_cache.get(path)
+	if cached is not None and cached[0] == stamp:
+		return cached[1]
+	code = None
+	if cache_directory is not None:
+		from hashlib import blake2b
+		header = MAGIC_NUMBER + b'%d %d\n' % stamp
+		cache_path = join(cache_directory, '%s.%s.pyc' % (
+			basename(path), blake2b(path.encode(), digest_size=8).hexdigest()
+		))
+		if exists(cache_path):
+			data = load(cache_path, 'bytes')
+			if data.startswith(header):
+				code = loads(data[len(header):])
+	if code is None:
+		source = ''
+		for cell in load(path, 'json')['cells']:
+			if cell['cell_type'] == 'code':
+				source += ''.join(line for line in cell['source'] if not line.startswith('%')) + '\n'
+		code = compile(source, path, 'exec')
+		if cache_directory is not None:
+			makedirs(cache_directory, exist_ok=True)
+			save(cache_path, header + dumps(code), 'bytes')
+	_run_notebook_cache[path] = stamp, code
+	return code
 
 def already_running(path_pidfile: str = 'pid.txt') -> bool:
 	''' Uses a PID file to check if an instance of this script is already running. If it's